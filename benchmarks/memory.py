@@ -0,0 +1,118 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Benchmark of memory footprint of parsed objects and peak memory of parse, export and info
+
+Usage: python memory.py [--count 1000] [--size 1048576] [--json]
+"""
+
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'examples'))
+
+
+def create_cases(size: int) -> dict:
+    """ Return the benchmarked objects by name as (object, count of parsed instances scale) """
+    from easy_enum import Enum
+    from easy_struct import DataStructure, Bytes, Array, Int8u, Int16ul, Int32ul, Int32sl
+    from uboot import ImgHeader, Img, UImage
+
+    class ImageType(Enum):
+        STANDALONE = (1, "standalone", "Standalone Program")
+        KERNEL = (2, "kernel", "Kernel Image")
+
+    # the layout of DSClassic in tests/test_struct_api.py
+    class Classic(DataStructure):
+        signature = Int32ul(default=0x155729, pfmt='X')
+        image_type = Int8u(default=ImageType.STANDALONE, choices=ImageType)
+        image_size = Int32ul(default=1280000, pfmt='Z')
+        _reserved0 = Int16ul(name="reserved")
+        data = Bytes(length=100, empty=0x0F, name='raw_data')
+        items = Array(itype=Int32sl, length=5, offset=5, default=[0, 1, 2, 3, -10000000])
+
+    class LargeArray(DataStructure):
+        count: Int32ul(count_of='values')
+        values: Array(itype=Int32ul, length='count')
+
+    class LargeBytes(DataStructure):
+        size: Int32ul(size_of='data')
+        data: Bytes(length='size')
+
+    payload = bytes(range(256)) * (size // 256)
+    return {
+        'classic': (Classic(image_size=10), 1),
+        'uboot_header': (ImgHeader(load_address=0x80000), 1),
+        'uboot_img': (Img(data=bytearray(payload[:4096])), 1),
+        'uboot_image': (UImage(image_data=payload[:4096]), 1),
+        'large_array': (LargeArray(values=list(range(size // 4))), 100),
+        'large_bytes': (LargeBytes(data=payload), 100),
+    }
+
+
+def measure(function, *args) -> tuple:
+    """ Return the result of function, memory allocated by the result and peak allocation during call [B] """
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def bench_case(obj, count: int) -> dict:
+    cls = obj.__class__
+    data = obj.export()
+    # create the prototype, layout and other cached data before measuring
+    cls.parse(data).info()
+
+    objs, current, parse_peak = measure(lambda: [cls.parse(data) for _ in range(count)])
+    _, _, export_peak = measure(lambda: [o.export() for o in objs[:1]])
+    _, _, info_peak = measure(lambda: objs[0].info())
+
+    return {
+        'raw_size': len(data),
+        'instances': count,
+        'bytes_per_instance': current // count,
+        'parse_peak': parse_peak // count,
+        'export_peak': export_peak,
+        'info_peak': info_peak,
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark of memory footprint")
+    parser.add_argument('--count', type=int, default=1000, help="The count of parsed instances")
+    parser.add_argument('--size', type=int, default=1024 * 1024, help="The size of large Array and Bytes items")
+    parser.add_argument('--json', action='store_true', help="Print results in JSON format")
+    args = parser.parse_args()
+
+    results = {name: bench_case(obj, max(args.count // scale, 1))
+               for name, (obj, scale) in create_cases(args.size).items()}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("{:14s} {:>10s} {:>12s} {:>12s} {:>12s} {:>12s}".format(
+            'case', 'raw [B]', 'object [B]', 'parse [B]', 'export [B]', 'info [B]'))
+        for name, result in results.items():
+            print("{:14s} {raw_size:10d} {bytes_per_instance:12d} {parse_peak:12d} {export_peak:12d} "
+                  "{info_peak:12d}".format(name, **result))
@@ -0,0 +1,115 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Benchmark of package import, creation and compilation of DataStructure classes
+
+Usage: python startup.py [--classes 400] [--repeat 5] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+
+
+def bench_import(repeat: int) -> float:
+    """ Return the minimal time of 'import easy_struct' in new interpreter [s] """
+    code = "import time; t = time.perf_counter(); import easy_struct; print(time.perf_counter() - t)"
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        times.append(float(output))
+    return min(times)
+
+
+def create_classes(count: int) -> list:
+    from easy_struct import DataStructure, Struct, Bytes, String, Int8u, Int16ul, Int32ul, Int32ub, Float32l
+
+    classes = []
+    for i in range(count):
+        if i % 2:
+            # annotation syntax
+            ns = {'__annotations__': {
+                'magic': Int32ub(default=i, choices=[i]),
+                'version': Int16ul,
+                'flags': Int8u,
+                'size': Int32ul,
+                'gain': Float32l(default=0.0),
+                'name': String(length=16),
+                'data': Bytes(length='size'),
+            }}
+        else:
+            # classic syntax
+            ns = {'magic': Int32ul, 'version': Int16ul, 'flags': Int8u, 'size': Int32ul, 'gain': Float32l(default=0.0)}
+            if classes:
+                ns['child'] = Struct(classes[-1])
+
+        classes.append(type(DataStructure)('Struct{}'.format(i), (DataStructure,), ns))
+
+    return classes
+
+
+def bench_classes(count: int, repeat: int) -> float:
+    """ Return the minimal time of creating count of classes [s] """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        create_classes(count)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_compile(count: int, repeat: int) -> float:
+    """ Return the minimal time of compiling layouts and default images of count of classes [s]
+
+    The compiled plans are loaded from on-disk cache if they were stored by previous run.
+    """
+    times = []
+    for _ in range(repeat):
+        classes = create_classes(count)
+        start = time.perf_counter()
+        for cls in classes:
+            cls._get_layout()
+            cls._get_prototype()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark of import and class creation")
+    parser.add_argument('--classes', type=int, default=400, help="The count of created classes")
+    parser.add_argument('--repeat', type=int, default=5, help="The count of repetitions")
+    parser.add_argument('--json', action='store_true', help="Print results in JSON format")
+    args = parser.parse_args()
+
+    results = {
+        'import_ms': bench_import(args.repeat) * 1000,
+        'classes': args.classes,
+        'create_classes_ms': bench_classes(args.classes, args.repeat) * 1000,
+        'compile_classes_ms': bench_compile(args.classes, args.repeat) * 1000,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("import easy_struct:     {:8.2f} ms".format(results['import_ms']))
+        print("create {:4d} classes:    {:8.2f} ms".format(args.classes, results['create_classes_ms']))
+        print("compile {:4d} classes:   {:8.2f} ms".format(args.classes, results['compile_classes_ms']))
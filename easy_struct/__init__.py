@@ -12,10 +12,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from easy_struct.base_class import DataStructure, Struct, prefix
-from easy_struct.base_types import IntBits, Int, Float, String, Bytes, Array
+import sys
+
+from easy_struct.base_class import DataStructure, Struct, Union, prefix
+from easy_struct.base_types import IntBits, Int, Float, String, Bytes, Compressed, Array
+from easy_struct.decoder import Decoder
+from easy_struct.file_data import FileData, FileBytes
+from easy_struct.compression import CompressedData
+from easy_struct.checksum import crc32
 from easy_struct.help_types import *
 
+# The rarely used parts are imported on first access
+LAZY_NAMES = {
+    'RingBuffer': 'easy_struct.ring',
+    'RecordView': 'easy_struct.ring',
+    'Monitor': 'easy_struct.monitor',
+    'Metrics': 'easy_struct.monitor',
+    'Tracer': 'easy_struct.monitor',
+    'Summary': 'easy_struct.stats',
+    'arrow_schema': 'easy_struct.converter',
+    'to_arrow': 'easy_struct.converter',
+    'from_arrow': 'easy_struct.converter',
+}
+
+if sys.version_info < (3, 7):
+    from easy_struct.ring import RingBuffer, RecordView
+    from easy_struct.monitor import Monitor, Metrics, Tracer
+    from easy_struct.stats import Summary
+    from easy_struct.converter import arrow_schema, to_arrow, from_arrow
+
+
+def __getattr__(name):
+    if name not in LAZY_NAMES:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+    from importlib import import_module
+    value = globals()[name] = getattr(import_module(LAZY_NAMES[name]), name)
+    return value
+
 
 __author__  = "Martin Olejar"
 __contact__ = "martin.olejar@gmail.com"
@@ -25,14 +58,44 @@ __status__  = "Development"
 __all__ = [
     # Helper functions
     "prefix",
+    "crc32",
 
     # The Base class
     "DataStructure",
 
+    # The stream decoder
+    "Decoder",
+
+    # The shared memory ring of records
+    "RingBuffer",
+    "RecordView",
+
+    # The file backed data
+    "FileData",
+    "FileBytes",
+
+    # The compressed data
+    "CompressedData",
+
+    # The summary of item values
+    "Summary",
+
+    # The Apache Arrow conversion
+    "arrow_schema",
+    "to_arrow",
+    "from_arrow",
+
+    # The instrumentation
+    "Monitor",
+    "Metrics",
+    "Tracer",
+
     # The classes for items
     "Struct",
+    "Union",
     "String",
     "Bytes",
+    "Compressed",
     "Array",
     "Float",
     "Int",
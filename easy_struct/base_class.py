@@ -13,13 +13,28 @@
 # limitations under the License.
 
 from easy_enum import Enum
-from easy_struct.base_types import IntBits, Int, Float, String, Array, Bytes
-from typing import Optional, Union, Any
+from easy_struct.base_types import IntBits, Int, Float, String, Array, Bytes, Compressed
+from easy_struct.cache import ParseCache, PLAN_VERSION, PLAN_IMAGE_MAX, get_plan_cache
+from easy_struct.layout import Layout
+from easy_struct.iov import Segments, write_iov
+from easy_struct.file_data import FileData, FileBytes
+from easy_struct.compression import CompressedData
+from easy_struct.checksum import crc32_segments
+from typing import Optional, Any, Iterable
+from time import perf_counter
+from operator import itemgetter
 
 
 ########################################################################################################################
 # Helper functions for base DataStructure
 ########################################################################################################################
+# The names of attributes which every class has
+DUNDERS = frozenset(dir(type('DataStructure', (object,), {})))
+
+# The attributes of items which don't affect the binary image
+SCHEMA_IGNORED = frozenset(('print_format', 'description', 'name'))
+
+
 def loff(offset: int, tabsize: int, string: str) -> str:
     return str(" " * (tabsize * offset)) + string
 
@@ -78,6 +93,12 @@ def fmt_bytes(name: str, metadata: Any, data: bytearray, tabsize: int = 4, offse
 
 def fmt_array(name: str, metadata: Any, data: list, tabsize: int = 4, offset: int = 0) -> str:
     msg = str()
+    if metadata.is_struct(metadata.item_type):
+        msg += loff(offset, tabsize, "{}[{} * {}]:\n".format(name, len(data), metadata.item_type.__name__))
+        for i, item in enumerate(data):
+            msg += loff(offset + 1, tabsize, "[{}]:\n".format(i))
+            msg += item.info(tabsize, offset + 2)
+        return msg
     msg += loff(offset, tabsize, "{}[{} * {}]:\n".format(name, len(data), metadata.item_type.__class__.__name__))
     msg += loff(offset + 1, tabsize, "{}\n".format(data))
     return msg
@@ -88,22 +109,90 @@ def fmt_string(name: str, metadata: Any, value: str, tabsize: int, offset: int,
     return msg
 
 
+def clone_value(value: Any) -> Any:
+    if isinstance(value, bytearray):
+        return bytearray(value)
+    if isinstance(value, FileBytes):
+        return bytearray(value.data) if value.materialized else value
+    if isinstance(value, list):
+        return [v._clone() for v in value] if value and isinstance(value[0], DataStructure) else list(value)
+    if isinstance(value, DataStructure):
+        return value._clone()
+    if isinstance(value, CompressedData):
+        return value.copy()
+    return value
+
+
+def get_value(values: Any, path: str) -> Any:
+    for key in path.split('.'):
+        if not values or key not in values:
+            raise KeyError("Unresolved reference: '{}'".format(path))
+        values = values[key]
+    return values
+
+
+def get_method(metadata: Compressed, values: Any) -> str:
+    """ Return the compression method of Compressed item for values of structure """
+    return metadata.get_method(get_value(values, metadata.tag) if metadata.tag else None)
+
+
+def get_item(itype: type, endian: Optional[str]) -> Any:
+    """ Return the instance of item type used without parameters (e.g. "value: Int16ul") """
+    item = itype()
+    if endian and isinstance(item, (Int, Float)):
+        item.endian = endian
+    return item
+
+
+def get_schema(metadata: Any) -> tuple:
+    """ Return the description of item used for schema fingerprint (without print format, description and name) """
+    schema = [type(metadata).__name__]
+    for slot in [slot for base in type(metadata).__mro__ for slot in base.__dict__.get('__slots__', ())]:
+        value = getattr(metadata, slot, None)
+        if value is None or type(value) in (int, str, bool, float) or slot in SCHEMA_IGNORED:
+            schema.append(value if slot not in SCHEMA_IGNORED else None)
+        elif isinstance(value, type) and issubclass(value, DataStructure):
+            schema.append(value.fingerprint())
+        elif isinstance(value, type) and issubclass(value, Enum):
+            schema.append((value.__name__, tuple(value)))
+        elif isinstance(value, type):
+            schema.append(value.__name__)
+        elif isinstance(value, dict):
+            schema.append(tuple((k, v.fingerprint() if isinstance(v, type) and issubclass(v, DataStructure) else v)
+                                for k, v in value.items()))
+        elif isinstance(value, (bytes, bytearray)):
+            schema.append(value.hex())
+        elif isinstance(value, (list, tuple)):
+            schema.append(tuple(v.export(update=False).hex() if isinstance(v, DataStructure) else v for v in value))
+        else:
+            schema.append(get_schema(value))
+    return tuple(schema)
+
+
+def freeze_value(value: Any) -> Any:
+    if isinstance(value, bytearray):
+        return bytes(value)
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
 ########################################################################################################################
 # Metaclass for base DataStructure
 ########################################################################################################################
 class MetaStructure(type):
     """ MetaClass for Structure Type """
 
-    def __new__(mcs, name, bases, ns, endian=None):
+    def __new__(mcs, name, bases, ns, endian=None, frozen=False):
         if name != 'DataStructure':
             if '__annotations__' in ns:
                 for key, value in ns['__annotations__'].items():
                     if isinstance(value, type):
-                        value = ns['__annotations__'][key] = value()
-                    if not isinstance(value, (Struct, Int, IntBits, Float, String, Bytes, Array)):
-                        raise Exception()
-                    if endian and isinstance(value, (Int, Float)):
+                        value = ns['__annotations__'][key] = get_item(value, endian)
+                    elif endian and isinstance(value, (Int, Float)):
                         value.endian = endian
+                    if not isinstance(value, (Struct, Union, Int, IntBits, Float, String, Bytes, Array)):
+                        raise Exception()
                     # create class attribute with default value
                     ns[key] = value.default
 
@@ -111,7 +200,7 @@ class MetaStructure(type):
                 annotations = {}
                 for key, value in ns.items():
                     # ignore hidden class attributes
-                    if key in set(dir(type(name, (object,), {}))) or (key.startswith('_') and key.endswith('_')):
+                    if key in DUNDERS or (key.startswith('_') and key.endswith('_')):
                         continue
                     # ignore methods and properties
                     if isinstance(value, type(Struct.validate)) or isinstance(value, staticmethod) or \
@@ -119,14 +208,66 @@ class MetaStructure(type):
                         continue
                     # convert class to objects
                     if isinstance(value, type):
-                        value = value()
-                    if not isinstance(value, (Struct, Int, IntBits, String, Bytes, Array)):
+                        value = get_item(value, None)
+                    if not isinstance(value, (Struct, Union, Int, IntBits, Float, String, Bytes, Array)):
                         raise Exception()
                     annotations[key] = value
                     ns[key] = value.default
 
                 ns['__annotations__'] = annotations
 
+            # the names of items and the names of items with mutable value
+            items = ns['__annotations__']
+            ns['_fields_'] = tuple(items.keys())
+            ns['_mutable_'] = tuple(k for k, v in items.items() if isinstance(v, (Struct, Union, Bytes, Array)))
+
+            # the union item with default case selected by default value of tag item
+            for key, value in items.items():
+                if isinstance(value, Union):
+                    keys = value.tag.split('.')
+                    tag_items = items
+                    for tag_key in keys[:-1]:
+                        if not isinstance(tag_items.get(tag_key), Struct):
+                            raise TypeError("Item '{}' of class '{}' refers to tag '{}' not inside Struct items".format(
+                                key, name, value.tag))
+                        tag_items = tag_items[tag_key].struct.__annotations__
+                    if keys[-1] not in tag_items:
+                        raise KeyError("Item '{}' of class '{}' refers to unknown tag '{}'".format(
+                            key, name, value.tag))
+                    value.bind(tag_items[keys[-1]].default)
+                    ns[key] = value.default
+            ns['_aliases_'] = {v.name: k for k, v in reversed(tuple(items.items())) if v.name}
+            ns['_getter_'] = itemgetter(*items.keys()) if items else staticmethod(lambda values: ())
+
+            # the integer items calculated in export
+            ns['_computed_'] = tuple(k for k, v in items.items() if isinstance(v, Int) and v.compute is not None)
+            for key in ns['_computed_']:
+                kind = items[key].compute[0]
+                for ref in items[key].compute[1:]:
+                    if ref not in items:
+                        raise KeyError("Item '{}' of class '{}' refers to unknown item '{}'".format(key, name, ref))
+                    if isinstance(items[ref], IntBits):
+                        raise TypeError("Item '{}' of class '{}' can't refer to bits item '{}'".format(key, name, ref))
+                    if kind == 'count' and not isinstance(items[ref], (Array, Bytes, String)):
+                        raise TypeError("Item '{}' of class '{}' can't count values of item '{}'".format(
+                            key, name, ref))
+
+            # frozen object is immutable and hashable
+            frozen = frozen or any(getattr(base, '_frozen_', False) for base in bases)
+            if frozen:
+                if ns['_computed_']:
+                    raise TypeError("Item '{}' of frozen class '{}' can't be computed".format(
+                        ns['_computed_'][0], name))
+                for key, value in items.items():
+                    structs = value.cases.values() if isinstance(value, Union) else \
+                              [value.struct] if isinstance(value, Struct) else \
+                              [value.item_type] if isinstance(value, Array) and value.is_struct(value.item_type) else []
+                    if not all(struct._frozen_ for struct in structs):
+                        raise TypeError("Item '{}' of frozen class '{}' must be frozen structure".format(key, name))
+            else:
+                ns.setdefault('__hash__', None)
+            ns['_frozen_'] = frozen
+
         return super().__new__(mcs, name, bases, ns)
 
 
@@ -135,29 +276,248 @@ class MetaStructure(type):
 ########################################################################################################################
 class DataStructure(metaclass=MetaStructure):
 
+    # the cached binary image of unmodified object (None if modified) and the cached hash of frozen object
+    __slots__ = ('_image_', '_hash_')
+
+    _fields_ = ()
+    _mutable_ = ()
+    _aliases_ = {}
+    _getter_ = staticmethod(lambda values: ())
+    _computed_ = ()
+    _frozen_ = False
+    # the Monitor attached to class (attached to DataStructure observes all classes)
+    _monitor_ = None
+
     def __init__(self, **kwargs):
         """
 
         """
-        for name, metadata in getattr(self.__class__, '__annotations__', {}).items():
-            if name in kwargs:
-                value = metadata.validate(kwargs[name])
-            else:
+        prototype = self._get_prototype()
+        annotations = getattr(self.__class__, '__annotations__', {})
+        values = self.__dict__
+        values.update(prototype.__dict__)
+        for name in self._mutable_:
+            if name not in kwargs:
+                values[name] = clone_value(values[name])
+        for name, value in kwargs.items():
+            if name in annotations:
+                values[name] = annotations[name].validate(value)
+        if kwargs and self._frozen_:
+            for name in self._mutable_:
+                values[name] = freeze_value(values[name])
+
+        object.__setattr__(self, '_image_', None if kwargs else prototype._image_)
+        object.__setattr__(self, '_hash_', None)
+
+    @classmethod
+    def fingerprint(cls) -> str:
+        """ Return the stable hash of class schema (names, types, sizes, offsets, endian and references of items) """
+        fingerprint = cls.__dict__.get('_fingerprint_')
+        if fingerprint is None:
+            from hashlib import blake2b
+            schema = [PLAN_VERSION, cls._frozen_] + [(name, get_schema(metadata)) for name, metadata in
+                                                     getattr(cls, '__annotations__', {}).items()]
+            fingerprint = cls._fingerprint_ = blake2b(repr(schema).encode(), digest_size=16).hexdigest()
+        return fingerprint
+
+    @classmethod
+    def _get_plan(cls) -> tuple:
+        """ Return the compiled plan of class stored in on-disk cache and the cache (None if it's not available)
+
+        The classes defined inside functions are not cached.
+        """
+        if '_plan_' not in cls.__dict__:
+            cache = get_plan_cache(cls.__module__) if '<locals>' not in cls.__qualname__ else None
+            plan = cache.get(cls.__qualname__, cls.fingerprint()) if cache else None
+            cls._plan_ = (plan, cache)
+        return cls._plan_
+
+    @classmethod
+    def _get_prototype(cls):
+        """ Return the object with default values and its binary image, created once per class """
+        prototype = cls.__dict__.get('_prototype_')
+        if prototype is None:
+            prototype = cls.__new__(cls)
+            for name, metadata in getattr(cls, '__annotations__', {}).items():
                 value = metadata.default
                 if isinstance(metadata, Bytes) and value is None:
                     value = bytearray([metadata.empty] * metadata.size)
+                prototype.__dict__[name] = freeze_value(value) if cls._frozen_ else value
+            object.__setattr__(prototype, '_image_', None)
+            object.__setattr__(prototype, '_hash_', None)
+            plan, cache = cls._get_plan()
+            if plan is not None and 'image' in plan:
+                prototype.__dict__.update(plan['computed'])
+                image = bytes.fromhex(plan['image'])
+            elif any(prototype.__dict__[name] is None for name in cls._mutable_):
+                # the union without case for default value of tag item, the default object can't be exported
+                image = None
+            else:
+                image = prototype.export(update=False)
+                if plan is not None and len(image) <= PLAN_IMAGE_MAX:
+                    plan['image'] = image.hex()
+                    plan['computed'] = {name: prototype.__dict__[name] for name in cls._computed_}
+                    cache.update()
+            object.__setattr__(prototype, '_image_', image)
+            cls._prototype_ = prototype
 
-            self.__dict__[name] = value
+        return prototype
+
+    @classmethod
+    def _static_size(cls) -> Optional[int]:
+        """ Return the size of binary image if it doesn't depend on values, otherwise None """
+        if '_static_size_' not in cls.__dict__:
+            plan, cache = cls._get_plan()
+            if plan is not None and 'size' in plan:
+                cls._static_size_ = plan['size']
+                return cls._static_size_
+
+            size = None
+            for metadata in getattr(cls, '__annotations__', {}).values():
+                if isinstance(metadata, Union) or \
+                   (isinstance(metadata, Bytes) and not isinstance(metadata.length, int)) or \
+                   (isinstance(metadata, (Struct, Array)) and metadata.size is None):
+                    break
+            else:
+                size = cls._get_prototype().raw_size()
+            cls._static_size_ = size
+            if plan is not None:
+                plan['size'] = size
+                cache.update()
+
+        return cls._static_size_
+
+    @classmethod
+    def _get_layout(cls) -> Optional[Layout]:
+        """ Return the precompiled layout if the class has static size, otherwise None """
+        if '_layout_' not in cls.__dict__:
+            items = getattr(cls, '__annotations__', {})
+            plan, cache = cls._get_plan()
+            if plan is not None and 'layout' in plan:
+                cls._layout_ = Layout.from_plan(items, plan['layout']) if plan['layout'] else None
+            else:
+                cls._layout_ = Layout.build(items)
+                if plan is not None:
+                    plan['layout'] = cls._layout_.plan() if cls._layout_ else None
+                    cache.update()
+        return cls._layout_
+
+    @classmethod
+    def _measure(cls, data: bytes, offset: int = 0) -> tuple:
+        """ Return the size of object stored in data and values of integer items without parsing all data
+
+        The size is None if data doesn't contain yet all items which the size depends on.
+        """
+        index = 0
+        values = {}
+        start = offset
+        ib_range = 0
+        ib_names = []
+        ib_mdatas = []
+
+        items = getattr(cls, '__annotations__', {})
+        names = tuple(items.keys())
+
+        while index < len(items):
+            name = names[index]
+            mdata = items[name]
+            index += 1
+
+            if isinstance(mdata, IntBits):
+                ib_names.append(name)
+                ib_mdatas.append(mdata)
+                if ib_range < (mdata.offset + mdata.bits):
+                    ib_range = mdata.offset + mdata.bits
+                if index < len(items) and isinstance(items[names[index]], IntBits):
+                    continue
+
+            if ib_range:
+                length = (ib_range // 8) + 1 if ib_range % 8 else ib_range // 8
+                if offset + length <= len(data):
+                    raw_value = int.from_bytes(data[offset: offset + length], byteorder='little', signed=False)
+                    for i, m in enumerate(ib_mdatas):
+                        values[ib_names[i]] = m.decode(raw_value)
+                offset += length
+                ib_range = 0
+                ib_names = []
+                ib_mdatas = []
+                continue
+
+            offset += mdata.offset
+            try:
+                if isinstance(mdata, (Struct, Union)):
+                    struct = mdata.struct if isinstance(mdata, Struct) else mdata.select(get_value(values, mdata.tag))
+                    size, values[name] = struct._measure(data, offset)
+                    if size is None:
+                        return None, values
+                    offset += size
+                elif isinstance(mdata, (Bytes, Array)):
+                    length = mdata.length
+                    if isinstance(length, str):
+                        length = get_value(values, length)
+                    size = mdata.data_size(length) if isinstance(mdata, Array) else length
+                    if size is not None:
+                        offset += size
+                    else:
+                        for _ in range(length):
+                            size, _ = mdata.item_type._measure(data, offset)
+                            if size is None:
+                                return None, values
+                            offset += size
+                else:
+                    if isinstance(mdata, (Int, Float)) and offset + mdata.size <= len(data):
+                        values[name] = mdata.unpack(data, offset)
+                    offset += mdata.size
+            except KeyError:
+                # the referenced item is not available yet
+                return None, values
+
+        return offset - start, values
+
+    def _clone(self):
+        if self._frozen_:
+            return self
+
+        obj = self.__class__.__new__(self.__class__)
+        obj.__dict__.update(self.__dict__)
+        for name in self._mutable_:
+            obj.__dict__[name] = clone_value(obj.__dict__[name])
+        object.__setattr__(obj, '_image_', self._image_)
+        object.__setattr__(obj, '_hash_', None)
+        return obj
+
+    def _intact(self) -> bool:
+        """ Check if the cached binary image is still valid (mutable values could be changed in place)
+
+        The mutable values are compared with default values, so they are checked only for the image of prototype.
+        Other images (unpickled or copied) are valid only if the object has no mutable values except of nested
+        objects, which check their own images.
+        """
+        if self._image_ is None:
+            return False
+        if self._frozen_:
+            return True
+
+        prototype = self._get_prototype()
+        default = self._image_ is prototype._image_
+        for name in self._mutable_:
+            value = self.__dict__[name]
+            if isinstance(value, DataStructure):
+                if not value._intact():
+                    return False
+            elif not default or value != prototype.__dict__[name]:
+                return False
+
+        return True
+
+    def _values(self) -> tuple:
+        return self._getter_(self.__dict__)
 
     def __getitem__(self, key):
         if not isinstance(key, str):
             raise KeyError()
 
-        for name, metadata in getattr(self.__class__, '__annotations__', {}).items():
-            if metadata.name == key:
-                key = name
-                break
-
+        key = self._aliases_.get(key, key)
         if key not in self.__dict__:
             raise KeyError()
 
@@ -167,20 +527,20 @@ class DataStructure(metaclass=MetaStructure):
         if not isinstance(key, str):
             raise KeyError()
 
-        for name, metadata in getattr(self.__class__, '__annotations__', {}).items():
-            if metadata.name == key:
-                key = name
-                break
-
+        key = self._aliases_.get(key, key)
         if key not in self.__dict__:
             raise KeyError()
 
         setattr(self, key, value)
 
     def __setattr__(self, key, value):
+        if self._frozen_:
+            raise AttributeError("Object of frozen class '{}' is read-only".format(self.__class__.__name__))
+
         if key in self.__dict__:
             annotations = getattr(self.__class__, '__annotations__')
             self.__dict__[key] = annotations[key].validate(value)
+            object.__setattr__(self, '_image_', None)
         else:
             prop_obj = getattr(self.__class__, key, None)
             if isinstance(prop_obj, property):
@@ -205,11 +565,19 @@ class DataStructure(metaclass=MetaStructure):
         if not isinstance(obj, DataStructure):
             return False
 
-        for key, value in self.__dict__.items():
-            if key not in obj or value != obj[key]:
-                return False
+        if self._fields_ != obj._fields_:
+            return False
 
-        return True
+        # objects created from the same binary image
+        if self._image_ is not None and self._image_ is obj._image_ and self._intact() and obj._intact():
+            return True
+
+        return self._values() == obj._values()
+
+    def __hash__(self):
+        if self._hash_ is None:
+            object.__setattr__(self, '_hash_', hash(self._values()))
+        return self._hash_
 
     def update(self):
         """ Update exporting data
@@ -238,9 +606,10 @@ class DataStructure(metaclass=MetaStructure):
             mdata = items[name]
             index += 1
 
-            if isinstance(mdata, IntBits) and bsize < (mdata.offset + mdata.bits):
-                bsize = mdata.offset + mdata.bits
-                if index < len(items):
+            if isinstance(mdata, IntBits):
+                if bsize < (mdata.offset + mdata.bits):
+                    bsize = mdata.offset + mdata.bits
+                if index < len(items) and isinstance(items[names[index]], IntBits):
                     continue
 
             if bsize > 0:
@@ -249,12 +618,16 @@ class DataStructure(metaclass=MetaStructure):
                 continue
 
             size += mdata.offset
-            if isinstance(mdata, Struct):
+            if isinstance(mdata, (Struct, Union)):
                 value = getattr(self, name)
+                if value is None:
+                    raise ValueError("The union item '{}' has no value".format(name))
                 size += value.raw_size()
-            if isinstance(mdata, Bytes):
+            elif isinstance(mdata, Bytes):
                 value = getattr(self, name)
-                size += len(value)
+                size += len(value.compressed(get_method(mdata, self)) if isinstance(value, CompressedData) else value)
+            elif isinstance(mdata, Array):
+                size += mdata.packed_size(getattr(self, name))
             else:
                 size += mdata.size
 
@@ -268,7 +641,15 @@ class DataStructure(metaclass=MetaStructure):
         :param show_all:
         :return:
         """
+        monitor = self._monitor_
+        if monitor is not None:
+            return monitor.call(self.__class__, 'info', None, self._info, tabsize, offset, align, show_all)
+        return self._info(tabsize, offset, align, show_all)
+
+    def _info(self, tabsize: int, offset: int, align: int, show_all: bool) -> str:
         self.update()
+        if self._computed_:
+            self._export_iov(0x00, False, None, None)
 
         msg = str()
         if self.__doc__:
@@ -289,7 +670,9 @@ class DataStructure(metaclass=MetaStructure):
                 msg += metadata.print_format(name, value, tabsize, offset, align)
 
             else:
-                if isinstance(metadata, Struct):
+                if isinstance(metadata, (Struct, Union)) and value is None:
+                    msg += loff(offset, tabsize, "{}: None\n".format(name))
+                elif isinstance(metadata, (Struct, Union)):
                     msg += loff(offset, tabsize, "{}:\n".format(name))
                     msg += value.info(tabsize, offset + 1, align, show_all)
                 elif isinstance(metadata, Array):
@@ -307,6 +690,24 @@ class DataStructure(metaclass=MetaStructure):
 
     def export(self, empty: int = 0x00, update: bool = True, ignore: Optional[list] = None) -> bytes:
         """
+        :param empty:
+        :param update:
+        :param ignore:
+        :return:
+        """
+        segments = self.export_iov(empty, update, ignore)
+        raw_data = b''.join(bytes(data) if isinstance(data, FileBytes) else data for data in segments)
+
+        if self._frozen_ and not ignore and empty == 0x00:
+            object.__setattr__(self, '_image_', raw_data)
+
+        return raw_data
+
+    def export_iov(self, empty: int = 0x00, update: bool = True, ignore: Optional[list] = None) -> list:
+        """ Export as list of data segments without joining them
+
+        The Bytes values bigger than IOV_THRESHOLD are returned as memoryview, the rest is joined into bytes.
+
         :param empty:
         :param update:
         :param ignore:
@@ -314,8 +715,20 @@ class DataStructure(metaclass=MetaStructure):
         """
         assert 0 <= empty <= 0xFF
 
+        monitor = self._monitor_
+        if monitor is not None:
+            return monitor.call(self.__class__, 'export', None, self._export_iov, empty, update, ignore, monitor)
+        return self._export_iov(empty, update, ignore, None)
+
+    def _export_iov(self, empty: int, update: bool, ignore: Optional[list], monitor: Any,
+                    store: bool = True, calculated: Optional[dict] = None) -> list:
+        """ Export items into data segments, the calculated values of computed items are not stored if store is False
+        (the object and its nested objects are not modified), they are added into calculated dict if specified
+        """
         index = 0
-        raw_data = b''
+        segments = Segments()
+        slots = []
+        positions = {}
         ib_range = 0
         ib_values = []
         ib_mdatas = []
@@ -326,20 +739,29 @@ class DataStructure(metaclass=MetaStructure):
         names = tuple(items.keys())
 
         if update:
-            self.update()
+            if monitor is not None:
+                monitor.call(self.__class__, 'update', None, self.update)
+            else:
+                self.update()
+
+        # unmodified object has the binary image prepared
+        if not ignore and empty == 0x00 and self._intact():
+            return [self._image_]
 
         while index < len(items):
             name = names[index]
             mdata = items[name]
             value = getattr(self, name)
             index += 1
+            if monitor is not None:
+                item_start = perf_counter()
 
             if isinstance(mdata, IntBits):
                 ib_values.append(value)
                 ib_mdatas.append(mdata)
                 if ib_range < (mdata.offset + mdata.bits):
                     ib_range = mdata.offset + mdata.bits
-                if index < len(items):
+                if index < len(items) and isinstance(items[names[index]], IntBits):
                     continue
 
             if ib_values:
@@ -347,16 +769,137 @@ class DataStructure(metaclass=MetaStructure):
                 raw_value = 0
                 for i, m in enumerate(ib_mdatas):
                     raw_value |= m.encode(ib_values[i])
-                raw_data += raw_value.to_bytes(length=length, byteorder='little', signed=False)
+                segments.add(raw_value.to_bytes(length=length, byteorder='little', signed=False))
+                if monitor is not None:
+                    for i, m in enumerate(ib_mdatas):
+                        monitor.item(self.__class__, 'export', names[index - len(ib_mdatas) + i],
+                                     segments.size - length, m.bits, item_start, perf_counter() - item_start)
                 ib_range = 0
                 ib_values = []
                 ib_mdatas = []
 
             else:
-                raw_data += bytes([empty] * mdata.offset)
-                raw_data += value.export(empty, update) if isinstance(mdata, Struct) else mdata.pack(value)
+                segments.add(bytes([empty] * mdata.offset))
+                start = segments.size
+                if isinstance(mdata, Union) and not isinstance(value, mdata.select(get_value(self, mdata.tag))):
+                    raise ValueError("The type of '{}' doesn't match the value of '{}'".format(name, mdata.tag))
+                if isinstance(mdata, (Struct, Union)):
+                    for data in value.export_iov(empty, update) if store else \
+                            value._export_iov(empty, False, None, None, False):
+                        segments.add(data)
+                elif isinstance(mdata, Array) and not store and mdata.is_struct(mdata.item_type):
+                    for obj in value:
+                        for data in obj._export_iov(empty, False, None, None, False):
+                            segments.add(data)
+                elif isinstance(mdata, Bytes):
+                    if isinstance(value, CompressedData):
+                        value = value.compressed(get_method(mdata, self))
+                    segments.add(value.segment() if isinstance(value, FileBytes) else memoryview(value))
+                elif name in self._computed_ and all(ref in items for ref in mdata.compute[1:]):
+                    # reserve the space for value calculated after all items are exported
+                    slots.append((name, mdata, segments.mark(), start))
+                    segments.add(bytes(mdata.size))
+                else:
+                    segments.add(mdata.pack(value))
+                positions[name] = (start, segments.size)
+                if monitor is not None:
+                    monitor.item(self.__class__, 'export', name, start, segments.size - start, item_start,
+                                 perf_counter() - item_start)
+
+        segments.flush()
+        if slots:
+            if monitor is not None:
+                values = monitor.call(self.__class__, 'compute', None, self._patch_computed, segments, slots,
+                                      positions, store)
+            else:
+                values = self._patch_computed(segments, slots, positions, store)
+            if calculated is not None:
+                calculated.update(values)
+        return segments
+
+    def _patch_computed(self, segments: Segments, slots: list, positions: dict, store: bool = True) -> dict:
+        """ Calculate values of computed items, write them into reserved space of exported data and return them """
+        values = {}
+        checksums = []
+        for slot in slots:
+            name, mdata, mark, _ = slot
+            kind, first, last = mdata.compute
+            if kind == 'crc':
+                checksums.append(slot)
+                continue
+            if kind == 'size':
+                value = positions[first][1] - positions[first][0]
+            elif kind == 'offset':
+                value = positions[first][0]
+            else:
+                value = len(getattr(self, first))
+            self._set_computed(segments, name, mdata, mark, value, store)
+            values[name] = value
+
+        # the CRC can cover other CRC items, they must be calculated first
+        while checksums:
+            for slot in checksums:
+                _, mdata, _, _ = slot
+                start, end = positions[mdata.compute[1]][0], positions[mdata.compute[2]][1]
+                if not any(start <= other[3] < end for other in checksums if other is not slot):
+                    break
+            else:
+                raise ValueError("Cyclic CRC items in class '{}'".format(self.__class__.__name__))
+            checksums.remove(slot)
+            name, mdata, mark, _ = slot
+            values[name] = crc32_segments(segments, start, end)
+            self._set_computed(segments, name, mdata, mark, values[name], store)
+        return values
+
+    def _set_computed(self, segments: Segments, name: str, mdata: Int, mark: tuple, value: int,
+                      store: bool = True) -> None:
+        segments.patch(mark, mdata.pack(mdata.validate(value)))
+        if store and self.__dict__[name] != value:
+            self.__dict__[name] = value
+            object.__setattr__(self, '_image_', None)
 
-        return raw_data
+    def computed(self) -> dict:
+        """ Return the values of computed items calculated from current values without storing them
+
+        The exported data are not joined and file data are streamed, e.g. for check of parsed CRC in validate().
+
+        :return: The calculated values by item name
+        """
+        if self._intact():
+            return {name: self.__dict__[name] for name in self._computed_}
+        values = {}
+        self._export_iov(0x00, False, None, None, False, values)
+        return values
+
+    def write_to(self, target: Any, empty: int = 0x00, update: bool = True) -> int:
+        """ Write exported data into file descriptor, file object or socket by one system call (writev/sendmsg)
+
+        :param target: The file descriptor, file object (with fileno() method) or socket
+        :param empty:
+        :param update:
+        :return: The count of written bytes
+        """
+        return write_iov(target, self.export_iov(empty, update))
+
+    def export_into(self, buffer: Any, offset: int = 0, empty: int = 0x00, update: bool = True) -> int:
+        """ Export into writable buffer (bytearray, mmap, shared memory) at offset without joining data segments
+
+        :param buffer: The object supporting writable buffer protocol
+        :param offset: The offset in buffer
+        :param empty:
+        :param update:
+        :return: The count of written bytes
+        """
+        start = offset
+        with memoryview(buffer) as view:
+            for data in self.export_iov(empty, update):
+                for chunk in data.chunks() if isinstance(data, FileBytes) else (data,):
+                    if offset + len(chunk) > len(view):
+                        raise ValueError("Not enough space: {} bytes at offset {} required".format(
+                            offset + len(chunk) - start, start))
+                    view[offset: offset + len(chunk)] = chunk
+                    offset += len(chunk)
+        return offset - start
 
     @classmethod
     def parse(cls, data: bytes, offset: int = 0):
@@ -366,8 +909,20 @@ class DataStructure(metaclass=MetaStructure):
         :return:
         """
         if len(data) <= offset:
-            raise Exception()
+            raise ValueError("Not enough data: {} bytes at offset {}".format(len(data), offset))
+
+        monitor = cls._monitor_
+        if monitor is not None:
+            return monitor.call(cls, 'parse', offset, cls._parse, data, offset, monitor)[0]
+        return cls._parse(data, offset, None)[0]
 
+    @classmethod
+    def _parse(cls, data: bytes, offset: int, monitor: Any, trusted: bool = False) -> tuple:
+        """ Return the parsed object and the count of parsed bytes
+
+        The trusted data (exported by the same class) are not validated.
+        """
+        start = offset
         index = 0
         kwargs = {}
         ib_range = 0
@@ -381,13 +936,15 @@ class DataStructure(metaclass=MetaStructure):
             name = names[index]
             mdata = items[name]
             index += 1
+            if monitor is not None:
+                item_start, item_offset = perf_counter(), offset + mdata.offset
 
             if isinstance(mdata, IntBits):
                 ib_names.append(name)
                 ib_mdatas.append(mdata)
                 if ib_range < (mdata.offset + mdata.bits):
                     ib_range = mdata.offset + mdata.bits
-                if index < len(items):
+                if index < len(items) and isinstance(items[names[index]], IntBits):
                     continue
 
             if ib_range:
@@ -395,35 +952,498 @@ class DataStructure(metaclass=MetaStructure):
                 raw_value = int.from_bytes(data[offset: offset + length], byteorder='little', signed=False)
                 for i, m in enumerate(ib_mdatas):
                     kwargs[ib_names[i]] = m.decode(raw_value)
+                    if monitor is not None:
+                        kwargs[ib_names[i]] = monitor.parsed(cls, ib_names[i], m, kwargs[ib_names[i]], offset, m.bits,
+                                                             item_start, perf_counter() - item_start)
                 offset += length
+                ib_range = 0
+                ib_names = []
+                ib_mdatas = []
 
             else:
                 offset += mdata.offset
-                if isinstance(mdata, Struct):
-                    value = mdata.struct.parse(data, offset)
-                    offset += value.raw_size()
+                if isinstance(mdata, (Struct, Union)):
+                    struct = mdata.struct if isinstance(mdata, Struct) else mdata.select(get_value(kwargs, mdata.tag))
+                    if trusted:
+                        value, size = struct._parse(data, offset, None, True)
+                        offset += size
+                    else:
+                        value = struct.parse(data, offset)
+                        offset += value.raw_size()
                 elif isinstance(mdata, Bytes):
                     length = mdata.length
                     if isinstance(length, str):
-                        il = kwargs
-                        for m in mdata.length.split('.'):
-                            if not il or m not in il:
-                                raise Exception()
-                            il = il[m]
-                        length = il
-                        
-                    value = bytearray(data[offset: offset + length])
+                        length = get_value(kwargs, length)
+
+                    if isinstance(data, FileData) and length >= data.min_size:
+                        value = data.get_bytes(offset, length)
+                    else:
+                        value = bytearray(data[offset: offset + length])
+                    if isinstance(mdata, Compressed):
+                        value = CompressedData(value, get_method(mdata, kwargs))
                     offset += length
+                elif isinstance(mdata, Array):
+                    length = mdata.length
+                    if isinstance(length, str):
+                        length = get_value(kwargs, length)
+
+                    if trusted and mdata.is_struct(mdata.item_type):
+                        value, size = mdata.item_type._load_array(data, length, offset)
+                        offset += size
+                    else:
+                        value = mdata.unpack(data, offset, length)
+                        offset += mdata.packed_size(value)
                 else:
                     value = mdata.unpack(data, offset)
                     offset += mdata.size
 
                 kwargs[name] = value
+                if monitor is not None:
+                    kwargs[name] = monitor.parsed(cls, name, mdata, value, item_offset, offset - item_offset,
+                                                  item_start, perf_counter() - item_start)
+
+        if offset > len(data):
+            raise ValueError("Not enough data: {} bytes required, {} bytes available".format(
+                offset - start, len(data) - start))
+
+        if trusted:
+            return cls._load(kwargs), offset - start
+
+        # the items of monitored object are validated by monitor
+        obj = cls(**kwargs) if monitor is None else cls._load(kwargs)
+        if monitor is not None:
+            monitor.call(cls, 'validate', start, obj.validate)
+        else:
+            obj.validate()
+        return obj, offset - start
+
+    @classmethod
+    def _load(cls, values: dict):
+        """ Create object from values of all items without validation """
+        obj = cls.__new__(cls)
+        obj.__dict__.update(values)
+        if cls._frozen_:
+            for name in cls._mutable_:
+                obj.__dict__[name] = freeze_value(obj.__dict__[name])
+        object.__setattr__(obj, '_image_', None)
+        object.__setattr__(obj, '_hash_', None)
+        return obj
+
+    @classmethod
+    def _load_array(cls, data: bytes, count: int, offset: int = 0) -> tuple:
+        """ Return the list of count objects parsed from trusted data without validation and their size """
+        layout = cls._get_layout()
+        if layout is not None:
+            return [cls._load(dict(zip(layout.names, row))) for row in layout.rows(data, count, offset)], \
+                count * layout.size
+
+        objs = []
+        start = offset
+        for _ in range(count):
+            obj, size = cls._parse(data, offset, None, True)
+            offset += size
+            objs.append(obj)
+        return objs, offset - start
+
+    def _dump(self) -> Optional[bytes]:
+        """ Return the binary image of current values (without update and without storing of computed values)
+        if it's parsed back into the same values, otherwise None
+
+        The image of object can restore other values, e.g. if the items referred by length of other items
+        are not updated or if the values are changed by packing (float precision, stripped strings).
+        """
+        if self._intact():
+            image = self._image_
+        else:
+            image = b''.join(bytes(data) if isinstance(data, FileBytes) else data
+                             for data in self._export_iov(0x00, False, None, None, False))
+        try:
+            obj, size = self._parse(image, 0, None, True)
+        except Exception:
+            return None
+        return image if size == len(image) and obj._values() == self._values() else None
+
+    def __reduce__(self):
+        image = self._dump()
+        if image is None:
+            return load_values, (self.__class__, dict(self.__dict__))
+        return load_object, (self.__class__, image)
+
+    def __copy__(self):
+        return self._clone()
+
+    def __deepcopy__(self, memo):
+        return self._clone()
+
+    @classmethod
+    def batch(cls, objs: Iterable = ()) -> 'Batch':
+        """ Return the list of objects pickled as one buffer of exported data
+
+        :param objs: The objects of this class
+        :return:
+        """
+        return Batch(cls, objs)
+
+    @classmethod
+    def parse_file(cls, file: Any, offset: int = 0, min_size: int = 64 * 1024):
+        """ Parse object from file, the Bytes items of min_size or more are referenced as FileBytes (not read)
+
+        The file opened from path is closed after parsing, unless the object refers its data by FileBytes.
 
-        obj = cls(**kwargs)
-        obj.validate()
+        :param file: The file path or binary file object
+        :param offset:
+        :param min_size:
+        :return:
+        """
+        data = FileData(file, min_size)
+        try:
+            obj = cls.parse(data, offset)
+        except Exception:
+            data.close()
+            raise
+        if not data.referenced:
+            data.close()
         return obj
 
+    @classmethod
+    def parse_array(cls, data: bytes, count: int, offset: int = 0) -> list:
+        """ Parse count of objects stored one after another
+
+        The objects of class with static layout are decoded in one pass.
+
+        :param data:
+        :param count:
+        :param offset:
+        :return:
+        """
+        layout = cls._get_layout()
+        # the monitored objects are parsed one by one to be counted
+        if layout is None or cls._monitor_ is not None:
+            objs = []
+            for _ in range(count):
+                obj = cls.parse(data, offset)
+                offset += obj.raw_size()
+                objs.append(obj)
+            return objs
+
+        objs = []
+        checks = [(layout.names[i], cls.__annotations__[layout.names[i]]) for i in layout.checks]
+        user_validate = cls.validate is not DataStructure.validate
+        for row in layout.rows(data, count, offset):
+            obj = cls.__new__(cls)
+            values = obj.__dict__
+            values.update(zip(layout.names, row))
+            for name, metadata in checks:
+                values[name] = metadata.validate(values[name])
+            if cls._frozen_:
+                for name in cls._mutable_:
+                    values[name] = freeze_value(values[name])
+            object.__setattr__(obj, '_image_', None)
+            object.__setattr__(obj, '_hash_', None)
+            if user_validate:
+                obj.validate()
+            objs.append(obj)
+        return objs
+
+    @classmethod
+    def parse_columns(cls, data: bytes, count: int, offset: int = 0) -> dict:
+        """ Parse count of objects with static layout into dict of value lists (columns) without creating objects
+
+        :param data:
+        :param count:
+        :param offset:
+        :return:
+        """
+        layout = cls._get_layout()
+        if layout is None:
+            raise TypeError("Class '{}' has not static layout".format(cls.__name__))
+
+        return layout.columns(data, count, offset)
+
+    @classmethod
+    def _offsets(cls) -> dict:
+        """ Return the items at static offset (including items of nested structures with dotted names)
+
+        The items are mapped to (offset, size, decode, metadata), where decode is called with raw data of item.
+        """
+        offsets = cls.__dict__.get('_offsets_')
+        if offsets is not None:
+            return offsets
+
+        offsets = {}
+        offset = 0
+        index = 0
+        ib_range = 0
+        ib_names = []
+        ib_mdatas = []
+
+        items = getattr(cls, '__annotations__', {})
+        names = tuple(items.keys())
+
+        while index < len(items):
+            name = names[index]
+            mdata = items[name]
+            index += 1
+
+            if isinstance(mdata, IntBits):
+                ib_names.append(name)
+                ib_mdatas.append(mdata)
+                if ib_range < (mdata.offset + mdata.bits):
+                    ib_range = mdata.offset + mdata.bits
+                if index < len(items) and isinstance(items[names[index]], IntBits):
+                    continue
+
+            if ib_range:
+                length = (ib_range // 8) + 1 if ib_range % 8 else ib_range // 8
+                for i, m in enumerate(ib_mdatas):
+                    offsets[ib_names[i]] = (offset, length, lambda raw, m=m: m.decode(int.from_bytes(raw, 'little')), m)
+                offset += length
+                ib_range = 0
+                ib_names = []
+                ib_mdatas = []
+                continue
+
+            offset += mdata.offset
+            if isinstance(mdata, Struct):
+                size = mdata.struct._static_size()
+                if size is None:
+                    break
+                for key, (start, length, decode, metadata) in mdata.struct._offsets().items():
+                    offsets[name + '.' + key] = (offset + start, length, decode, metadata)
+                decode = lambda raw, m=mdata: m.struct.parse(bytes(raw))
+            elif isinstance(mdata, (Int, Float)):
+                size = mdata.size
+                decode = mdata.unpack
+            elif isinstance(mdata, Array) and mdata.size is not None:
+                size = mdata.size
+                decode = lambda raw, m=mdata: m.unpack(bytes(raw))
+            elif isinstance(mdata, (String, Bytes)) and isinstance(mdata.length, int):
+                size = mdata.size
+                decode = lambda raw, m=mdata: m.unpack(bytes(raw))
+            else:
+                break
+            offsets[name] = (offset, size, decode, mdata)
+            offset += size
+
+        cls._offsets_ = offsets
+        return offsets
+
+    @classmethod
+    def _signatures(cls) -> list:
+        """ Return the constant items at static offset (with single choice) as list of (offset, raw data)
+
+        The longest constant is the first one.
+        """
+        signatures = cls.__dict__.get('_signatures_')
+        if signatures is None:
+            signatures = []
+            for offset, _, _, metadata in cls._offsets().values():
+                if isinstance(metadata, (Int, String)) and isinstance(metadata.choices, list) and \
+                   len(metadata.choices) == 1:
+                    signatures.append((offset, metadata.pack(metadata.choices[0])))
+            signatures.sort(key=lambda signature: len(signature[1]), reverse=True)
+            cls._signatures_ = signatures
+        return signatures
+
+    @classmethod
+    def select(cls, data: Any, where: Optional[dict] = None, fields: Optional[list] = None, offset: int = 0):
+        """ Scan objects stored one after another and yield only objects matching the conditions
+
+        The items of conditions and projection at static offset are decoded directly from data, the rest
+        of objects is not decoded. The size of objects without static size is measured from their integer items.
+
+        Usage:
+            for rec in ImgHeader.select('dump.bin', where={'image_type': ImageType.KERNEL,
+                                                           'data_size': lambda size: size > 1024 * 1024},
+                                        fields=['load_address']):
+                print(rec['load_address'])
+
+        :param data: The data, file path or binary file object
+        :param where: The conditions as dict of item names (dotted for nested items) with required value
+                      or with function returning True for required value
+        :param fields: The names of items returned as dict, the parsed objects are returned if None
+        :return: The iterator of dicts or objects
+        """
+        if not isinstance(data, (bytes, bytearray, memoryview, FileData)):
+            data = FileData(data)
+            try:
+                yield from cls.select(data, where, fields, offset)
+            finally:
+                # the yielded objects can refer data of file
+                if not data.referenced:
+                    data.close()
+            return
+
+        view = data if isinstance(data, FileData) else memoryview(data)
+        where = list(where.items()) if where else []
+        offsets = cls._offsets()
+        static_size = cls._static_size()
+
+        while offset < len(data):
+            values = None
+            if static_size is None:
+                size, values = cls._measure(data, offset)
+                if size is None:
+                    raise ValueError("Not enough data for object at offset {}".format(offset))
+            else:
+                size = static_size
+            if offset + size > len(data):
+                raise ValueError("Not enough data: {} bytes at offset {} required".format(size, offset))
+
+            record = {}
+            parsed = []
+
+            def get(name):
+                if name not in record:
+                    if name in offsets:
+                        start, length, decode, _ = offsets[name]
+                        record[name] = decode(view[offset + start: offset + start + length])
+                    else:
+                        try:
+                            record[name] = get_value(values, name)
+                        except KeyError:
+                            # the item at dynamic offset which isn't measured, the whole object must be parsed
+                            if not parsed:
+                                parsed.append(cls.parse(data, offset))
+                            record[name] = get_value(parsed[0], name)
+                return record[name]
+
+            if all(condition(get(name)) if callable(condition) else get(name) == condition
+                   for name, condition in where):
+                if fields is None:
+                    yield parsed[0] if parsed else cls.parse(data, offset)
+                else:
+                    yield {name: get(name) for name in fields}
+
+            offset += size
+
+    @classmethod
+    def summary(cls, data: Any, fields: Optional[list] = None, bins: int = 16, offset: int = 0,
+                count: Optional[int] = None) -> 'Summary':
+        """ Return the summary (count, min, max, mean, histogram) of items of objects stored one after another
+
+        :param data: The data, file path or binary file object
+        :param fields: The names of summarized items, all integer and float items and items with choices if None
+        :param bins: The count of histogram bins of items without choices
+        :param offset:
+        :param count: The count of objects, all objects until the end of data if None
+        :return: The summary, use result() for values or merge() to join summaries of more data parts
+        """
+        from easy_struct.stats import Summary
+        return Summary(cls, fields, bins).update(data, offset, count)
+
+    @classmethod
+    def sort_file(cls, source: Any, target: Any, keys: list, reverse: bool = False,
+                  run_records: Optional[int] = None, temp_dir: Optional[str] = None) -> int:
+        """ Sort the file of objects with static size by key items without parsing the objects
+
+        Usage:
+            ImgHeader.sort_file('headers.bin', 'sorted.bin', ['load_address', 'data_size'])
+
+        :param source: The data, file path or binary file object
+        :param target: The file path or binary file object for sorted objects
+        :param keys: The names of key items at static offset (dotted for items of nested structures)
+        :param reverse: Sort in descending order
+        :param run_records: The count of objects sorted in memory (1M if None), the sorted runs are spilled into
+                            temporary files
+        :param temp_dir: The directory of temporary files
+        :return: The count of sorted objects
+        """
+        from easy_struct.sort import RUN_RECORDS, sort_records
+        return sort_records(cls, source, target, keys, reverse, run_records or RUN_RECORDS, temp_dir)
+
+    @classmethod
+    def merge_files(cls, sources: list, target: Any, keys: list, reverse: bool = False) -> int:
+        """ Merge the files of objects with static size sorted by key items (e.g. by sort_file) into one file
+
+        :param sources: The list of data, file paths or binary file objects
+        :param target: The file path or binary file object for merged objects
+        :param keys: The names of key items at static offset (dotted for items of nested structures)
+        :param reverse: The sources are sorted in descending order
+        :return: The count of merged objects
+        """
+        from easy_struct.sort import merge_records
+        return merge_records(cls, sources, target, keys, reverse)
+
+    @classmethod
+    def parse_cache(cls) -> ParseCache:
+        """ Return the cache of parsed objects used by parse_cached() method, created once per class """
+        cache = cls.__dict__.get('_parse_cache_')
+        if cache is None:
+            cache = cls._parse_cache_ = ParseCache()
+        return cache
+
+    @classmethod
+    def parse_cached(cls, data: bytes, offset: int = 0):
+        """ Parse data with result cached by digest of data
+
+        The frozen object is returned directly from cache, otherwise its copy is returned.
+        The digest covers only the data of object, the size of object without static size is measured
+        from its integer items.
+
+        :param data:
+        :param offset:
+        :return:
+        """
+        size = cls._static_size()
+        if size is None:
+            size = cls._measure(data, offset)[0]
+            if size is None:
+                # not enough data, the parse raises the error
+                return cls.parse(data, offset)
+
+        cache = cls.parse_cache()
+        key = cache.key(data, offset, size)
+        obj = cache.get(key)
+        if obj is None:
+            obj = cls.parse(data, offset)
+            cache.put(key, obj)
+
+        return obj._clone()
+
+
+########################################################################################################################
+# The pickling of DataStructure objects by exported data
+########################################################################################################################
+def load_object(cls: MetaStructure, data: bytes) -> DataStructure:
+    """ Return the object unpickled from data exported by the same class (not validated) """
+    obj = cls._parse(data, 0, None, True)[0]
+    object.__setattr__(obj, '_image_', data)
+    return obj
+
+
+def load_values(cls: MetaStructure, values: dict) -> DataStructure:
+    """ Return the object unpickled from values of its items (not validated) """
+    return cls._load(values)
+
+
+def load_batch(cls: MetaStructure, data: bytes, count: int) -> 'Batch':
+    return Batch(cls, cls._load_array(data, count)[0])
+
+
+class Batch(list):
+    """ The list of objects of the same class pickled as one buffer of exported data
+
+    The objects are exported into one buffer and parsed without validation after unpickling,
+    the objects with static layout are decoded in one pass. If the image of any object isn't parsed back
+    into the same values, the objects are pickled one by one.
+    """
+
+    __slots__ = ('cls',)
+
+    def __init__(self, cls: MetaStructure, objs: Iterable = ()) -> None:
+        super().__init__(objs)
+        self.cls = cls
+
+    def __reduce__(self):
+        images = []
+        for obj in self:
+            image = obj._dump()
+            if image is None:
+                return Batch, (self.cls, list(self))
+            images.append(image)
+        return load_batch, (self.cls, b''.join(images), len(self))
+
 
 ########################################################################################################################
 # The Struct Type as DataStructure container
@@ -444,8 +1464,60 @@ class Struct:
     def default(self):
         return self.struct()
 
+    @property
+    def size(self) -> Optional[int]:
+        return self.struct._static_size()
+
+    def pack(self, value) -> bytes:
+        return value.export()
+
+    def unpack(self, data: bytes, offset: int = 0):
+        return self.struct.parse(data, offset)
+
     def validate(self, value):
         if not isinstance(value, self.struct):
             raise TypeError()
 
         return value
+
+
+########################################################################################################################
+# The Union Type as container for one of DataStructures selected by tag item
+########################################################################################################################
+class Union:
+    __slots__ = ('tag', 'cases', 'offset', 'name', 'description', 'default_case')
+
+    def __init__(self, tag: str, cases: dict, offset: int = 0, name: Optional[str] = None, desc: Optional[str] = None):
+
+        assert isinstance(tag, str)
+        assert cases and all(issubclass(struct, DataStructure) for struct in cases.values())
+
+        self.tag = tag
+        self.name = name
+        self.cases = dict(cases)
+        self.offset = offset
+        self.description = desc
+        self.default_case = None
+
+    def bind(self, tag_value) -> None:
+        """ Select the default case by default value of tag item (called by MetaStructure)
+
+        The default value of union is None if the default value of tag item has no case.
+        """
+        self.default_case = self.cases.get(tag_value)
+
+    @property
+    def default(self):
+        return self.default_case() if self.default_case is not None else None
+
+    def select(self, tag_value) -> MetaStructure:
+        try:
+            return self.cases[tag_value]
+        except KeyError:
+            raise ValueError("Unknown value of union tag '{}': {}".format(self.tag, tag_value)) from None
+
+    def validate(self, value):
+        if not isinstance(value, tuple(self.cases.values())):
+            raise TypeError()
+
+        return value
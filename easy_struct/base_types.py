@@ -13,8 +13,11 @@
 # limitations under the License.
 
 from typing import Optional, Union, Any
-from struct import unpack_from, pack
+from struct import Struct as Codec
 from easy_enum import Enum
+from easy_struct.file_data import FileBytes
+from easy_struct.compression import CompressedData, COMPRESSION_METHODS
+from easy_struct.bits import pack_bits, unpack_bits
 
 
 ########################################################################################################################
@@ -120,14 +123,23 @@ class Int:
     class_type = int
 
     __slots__ = ('bytes', 'endian', 'default', 'signed', 'offset', 'min_value', 'max_value', 'choices', 'constant',
-                 'print_format', 'name', 'description')
+                 'compute', 'print_format', 'name', 'description')
 
     def __init__(self, bytes: int, signed: bool = False, endian: str = 'little', default=0, offset: int = 0,
                  min: Optional[int] = None, max: Optional[int] = None, choices: Any = None,
-                 pfmt: Optional[str] = None, name: Optional[str] = None, desc: Optional[str] = None) -> None:
-
+                 pfmt: Optional[str] = None, name: Optional[str] = None, desc: Optional[str] = None,
+                 size_of: Optional[str] = None, offset_of: Optional[str] = None, count_of: Optional[str] = None,
+                 crc_of: Union[str, tuple, None] = None) -> None:
+        """
+        The value of integer can be calculated in export from other item of the same structure:
+        size_of - the size of exported item in bytes
+        offset_of - the offset of item from structure start
+        count_of - the count of items in Array (or count of bytes in Bytes)
+        crc_of - the CRC32 of exported item or range of items defined as tuple (first, last)
+        """
         assert endian in ('big', 'little')
         assert isinstance(signed, bool)
+        assert [size_of, offset_of, count_of, crc_of].count(None) >= 3
 
         self.name = name
         self.bytes = bytes
@@ -136,6 +148,7 @@ class Int:
         self.offset = offset
         self.choices = None
         self.print_format = pfmt
+        self.compute = None
         self.min_value = -(1 << ((bytes * 8) - 1)) if signed else 0
         self.max_value = (1 << ((bytes * 8) - 1)) - 1 if signed else (1 << (bytes * 8)) - 1
         self.description = desc
@@ -167,6 +180,15 @@ class Int:
             else:
                 raise Exception()
 
+        if size_of is not None:
+            self.compute = ('size', size_of, size_of)
+        elif offset_of is not None:
+            self.compute = ('offset', offset_of, offset_of)
+        elif count_of is not None:
+            self.compute = ('count', count_of, count_of)
+        elif crc_of is not None:
+            self.compute = ('crc',) + ((crc_of, crc_of) if isinstance(crc_of, str) else tuple(crc_of))
+
         self.default = self.validate(default)
 
     @property
@@ -200,6 +222,10 @@ class Int:
 ########################################################################################################################
 # The Float Type in Bytes as Item for DataStructure
 ########################################################################################################################
+# The codecs of Float items by (size, endian)
+FLOAT_CODECS = {}
+
+
 class Float:
 
     class_type = float
@@ -236,15 +262,20 @@ class Float:
     def size(self) -> int:
         return self.bytes
 
+    @property
+    def codec(self) -> Codec:
+        """ The codec of value, created on first use and shared by all items with the same size and endian """
+        codec = FLOAT_CODECS.get((self.bytes, self.endian))
+        if codec is None:
+            fmt = {'little': '<', 'big': '>'}[self.endian] + {2: 'e', 4: 'f', 8: 'd'}[self.bytes]
+            codec = FLOAT_CODECS[(self.bytes, self.endian)] = Codec(fmt)
+        return codec
+
     def pack(self, value: float) -> bytes:
-        fmt = {'little': '<', 'big': '>'}[self.endian]
-        fmt += {2: 'e', 4: 'f', 8: 'd'}[self.bytes]
-        return pack(fmt, value)
+        return self.codec.pack(value)
 
     def unpack(self, data: bytes, offset: int = 0) -> float:
-        fmt = {'little': '<', 'big': '>'}[self.endian]
-        fmt += {2: 'e', 4: 'f', 8: 'd'}[self.bytes]
-        return unpack_from(fmt, data, offset)[0]
+        return self.codec.unpack_from(data, offset)[0]
 
     def validate(self, value: float) -> float:
         if not isinstance(value, float):
@@ -354,14 +385,52 @@ class Bytes:
     def unpack(self, data: bytes, offset: int = 0) -> bytearray:
         return bytearray(data[offset: offset + self.size])
 
-    def validate(self, value: Union[bytes, bytearray]) -> bytearray:
-        if not isinstance(value, (bytes, bytearray)):
+    def validate(self, value: Union[bytes, bytearray, FileBytes]) -> Union[bytearray, FileBytes]:
+        if not isinstance(value, (bytes, bytearray, FileBytes)):
             raise TypeError()
 
         if isinstance(self.length, int) and len(value) != self.length:
             raise ValueError()
 
-        return value if isinstance(value, bytearray) else bytearray(value)
+        return value if isinstance(value, (bytearray, FileBytes)) else bytearray(value)
+
+
+########################################################################################################################
+# The Compressed Bytes Type as Item for DataStructure
+########################################################################################################################
+class Compressed(Bytes):
+    """ The Bytes item with compressed data, the value is CompressedData decompressed on demand
+
+    The compression method ('none', 'gzip', 'bzip2', 'lzma') is fixed or given by tag item (e.g. 'compression')
+    whose values are translated by methods dict (by default the numbering of U-Boot image header).
+    """
+
+    class_type = CompressedData
+
+    __slots__ = ('method', 'tag', 'methods')
+
+    def __init__(self, length: Any, method: str = 'none', tag: Optional[str] = None, methods: Optional[dict] = None,
+                 empty: int = 0, offset: int = 0, default: Union[bytes, bytearray, CompressedData, None] = None,
+                 name: Optional[str] = None, desc: Optional[str] = None) -> None:
+
+        self.method = method
+        self.tag = tag
+        self.methods = COMPRESSION_METHODS if methods is None else methods
+        super().__init__(length, empty, offset, default, name, desc)
+        if self.default is None:
+            self.default = CompressedData(bytearray([empty] * self.size))
+
+    def get_method(self, tag: Optional[int]) -> str:
+        """ Return the compression method for value of tag item """
+        return self.method if self.tag is None else self.methods.get(tag, tag)
+
+    def unpack(self, data: bytes, offset: int = 0) -> CompressedData:
+        return CompressedData(super().unpack(data, offset))
+
+    def validate(self, value: Union[bytes, bytearray, FileBytes, CompressedData]) -> CompressedData:
+        if isinstance(value, CompressedData):
+            return value
+        return CompressedData(super().validate(value))
 
 
 ########################################################################################################################
@@ -376,31 +445,75 @@ class Array:
     def __init__(self, itype, length: Union[int, str], offset: int = 0, default: Optional[list] = None,
                  name: Optional[str] = None, desc: Optional[str] = None) -> None:
 
-        assert isinstance(itype, (Int, Float, String)) or issubclass(itype, (Int, Float, String))
+        assert isinstance(itype, (IntBits, Int, Float, String)) or issubclass(itype, (Int, Float, String)) or \
+            hasattr(itype, 'parse_array')
 
         self.name = name
-        self.item_type = itype() if isinstance(itype, type) else itype
+        self.item_type = itype() if isinstance(itype, type) and not self.is_struct(itype) else itype
         self.length = length
         self.offset = offset
         self.description = desc
 
         if default is None:
-            self.default = [self.item_type.default for _ in range(length)] if isinstance(length, int) else []
+            self.default = [self.item_default() for _ in range(length)] if isinstance(length, int) else []
         elif isinstance(default, list):
             self.default = self.validate(default)
         else:
             raise Exception()
 
+    @staticmethod
+    def is_struct(itype) -> bool:
+        return isinstance(itype, type) and hasattr(itype, 'parse_array')
+
     @property
-    def size(self) -> int:
-        return self.item_type.size * self.length if isinstance(self.length, int) else None
+    def item_size(self) -> Optional[int]:
+        """ The size of item in bytes, None for structures without static size and IntBits """
+        if self.is_struct(self.item_type):
+            return self.item_type._static_size()
+        if isinstance(self.item_type, IntBits):
+            return None
+        return self.item_type.size
+
+    @property
+    def size(self) -> Optional[int]:
+        return self.data_size(self.length) if isinstance(self.length, int) else None
+
+    def data_size(self, length: int) -> Optional[int]:
+        """ Return the size of length items in bytes or None if the items have not static size """
+        if isinstance(self.item_type, IntBits):
+            return (self.item_type.bits * length + 7) // 8
+        item_size = self.item_size
+        return item_size * length if item_size is not None else None
+
+    def item_default(self) -> Any:
+        return self.item_type() if self.is_struct(self.item_type) else self.item_type.default
+
+    def packed_size(self, values: list) -> int:
+        size = self.data_size(len(values))
+        if size is None:
+            return sum(value.raw_size() for value in values)
+        return size
 
     def pack(self, values: list) -> bytes:
+        if self.is_struct(self.item_type):
+            return b''.join(v.export() for v in values)
+        if isinstance(self.item_type, IntBits):
+            # the items are packed without padding, the bit order is given by endian of item
+            itype = self.item_type
+            return pack_bits(values, itype.bits, itype.signed, itype.endian)
         return b''.join(self.item_type.pack(v) for v in values)
 
-    def unpack(self, data: bytes, offset: int = 0) -> list:
+    def unpack(self, data: bytes, offset: int = 0, length: Optional[int] = None) -> list:
+        length = self.length if length is None else length
+        if self.is_struct(self.item_type):
+            return self.item_type.parse_array(data, length, offset)
+        if isinstance(self.item_type, IntBits):
+            itype = self.item_type
+            return unpack_bits(data[offset: offset + self.data_size(length)], length, itype.bits, itype.signed,
+                               itype.endian)
+
         values = []
-        for i in range(self.length):
+        for i in range(length):
             values.append(self.item_type.unpack(data, offset))
             offset += self.item_type.size
         return values
@@ -409,11 +522,16 @@ class Array:
         if not isinstance(values, list):
             raise TypeError()
 
-        if len(values) != self.length:
+        if isinstance(self.length, int) and len(values) != self.length:
             raise ValueError()
 
-        for item in values:
-            self.item_type.validate(item)
+        if self.is_struct(self.item_type):
+            for item in values:
+                if not isinstance(item, self.item_type):
+                    raise TypeError()
+        else:
+            for item in values:
+                self.item_type.validate(item)
 
         return values
 
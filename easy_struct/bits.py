@@ -0,0 +1,155 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import sys
+from array import array
+from functools import lru_cache
+from typing import Iterable
+
+# The array type codes by item size in bytes as (unsigned, signed)
+ARRAY_CODES = {}
+for _code in 'BHILQ':
+    ARRAY_CODES.setdefault(array(_code).itemsize, (_code, _code.lower()))
+
+# The masks of arrays with up to this count of bits are cached
+CACHE_BITS = 64 * 1024
+
+
+########################################################################################################################
+# Helper functions
+########################################################################################################################
+def slot_size(bits: int) -> int:
+    """ Return the size in bytes of unpacked value of bits """
+    size = (bits + 7) // 8
+    for slot in (1, 2, 4, 8):
+        if size <= slot:
+            return slot
+    return size
+
+
+def build_masks(bits: int, count: int) -> tuple:
+    """ Return the masks for spreading count values of bits into slots of whole bytes
+
+    The packed values are spread by halving: the upper half of values in every block of slots is shifted to the
+    middle of block, so log2(count) shifts and masks of whole integer replace the shift of every value.
+
+    :return: (levels as list of (shift, low mask, high mask), mask of lowest bit in slots, mask of value in slots)
+    """
+    width = slot_size(bits) * 8
+    block = 1 << (count - 1).bit_length()
+    total = block * width // 8
+
+    def repeat(pattern: int, size: int) -> int:
+        return int.from_bytes(pattern.to_bytes(size, 'little') * (total // size), 'little')
+
+    levels = []
+    while block > 1:
+        half = block // 2
+        low = (1 << (half * bits)) - 1
+        high = ((1 << (block * bits)) - 1) ^ low
+        size = block * width // 8
+        levels.append((half * (width - bits), repeat(low, size), repeat(high, size)))
+        block = half
+
+    return levels, repeat(1, width // 8), repeat((1 << bits) - 1, width // 8)
+
+
+get_cached_masks = lru_cache(maxsize=64)(build_masks)
+
+
+def get_masks(bits: int, count: int) -> tuple:
+    return get_cached_masks(bits, count) if bits * count <= CACHE_BITS else build_masks(bits, count)
+
+
+########################################################################################################################
+# The bulk decode and encode of bit packed values
+########################################################################################################################
+def unpack_bits(data: bytes, count: int, bits: int, signed: bool = False, endian: str = 'little') -> list:
+    """ Unpack count of values of bits packed one after another without padding
+
+    The data are converted into one integer whose values are spread into slots of whole bytes by shifts and masks
+    of whole integer, the slots are converted into list by array module.
+
+    :param data: The packed data
+    :param count: The count of values
+    :param bits: The count of bits of one value
+    :param signed: The values are signed (two's complement)
+    :param endian: The bit order: 'little' - the first value is in the lowest bits of the first byte,
+                   'big' - the first value is in the highest bits of the first byte
+    """
+    if count == 0:
+        return []
+
+    length = (count * bits + 7) // 8
+    if len(data) < length:
+        raise ValueError("Not enough data: {} bytes of {} values required".format(length, count))
+
+    value = int.from_bytes(data[:length], endian)
+    if endian == 'big':
+        value >>= length * 8 - count * bits
+    else:
+        value &= (1 << (count * bits)) - 1
+
+    levels, ones, _ = get_masks(bits, count)
+    for shift, low, high in levels:
+        value = (value & low) | ((value & high) << shift)
+
+    size = slot_size(bits)
+    if signed and bits < size * 8:
+        # the slots with sign bit are filled with ones above the value
+        value |= ((value >> (bits - 1)) & ones) * (((1 << (size * 8)) - 1) ^ ((1 << bits) - 1))
+
+    # the slots of the first value are at the lowest bits of integer for little bit order, at the highest for big
+    raw = value.to_bytes(count * size, endian)
+    if size not in ARRAY_CODES:
+        return [int.from_bytes(raw[i: i + size], endian, signed=signed) for i in range(0, len(raw), size)]
+
+    values = array(ARRAY_CODES[size][signed], raw)
+    if size > 1 and endian != sys.byteorder:
+        values.byteswap()
+    return values.tolist()
+
+
+def pack_bits(values: Iterable[int], bits: int, signed: bool = False, endian: str = 'little') -> bytes:
+    """ Pack values of bits one after another without padding (the reverse of unpack_bits)
+
+    :param values: The values in range of bits
+    :param bits: The count of bits of one value
+    :param signed: The values are signed (two's complement)
+    :param endian: The bit order (see unpack_bits)
+    """
+    values = values if isinstance(values, list) else list(values)
+    count = len(values)
+    if count == 0:
+        return b''
+
+    size = slot_size(bits)
+    if size in ARRAY_CODES:
+        slots = array(ARRAY_CODES[size][signed], values)
+        if size > 1 and endian != sys.byteorder:
+            slots.byteswap()
+        raw = slots.tobytes()
+    else:
+        raw = b''.join(item.to_bytes(size, endian, signed=signed) for item in values)
+
+    levels, _, mask = get_masks(bits, count)
+    value = int.from_bytes(raw, endian) & mask
+    for shift, low, high in reversed(levels):
+        value = (value & low) | ((value >> shift) & high)
+
+    length = (count * bits + 7) // 8
+    if endian == 'big':
+        value <<= length * 8 - count * bits
+    return value.to_bytes(length, endian)
@@ -0,0 +1,178 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+from threading import Lock
+from collections import OrderedDict
+from typing import Optional, Any
+
+
+# The version of format of compiled plans (plans of other version are ignored)
+PLAN_VERSION = 1
+
+# The plans are stored on disk only if it's enabled by environment variable EASY_STRUCT_PLAN_CACHE=1
+PLAN_CACHE_ENABLED = os.environ.get('EASY_STRUCT_PLAN_CACHE', '0') == '1'
+
+# The default image bigger than this size is not stored in plan
+PLAN_IMAGE_MAX = 4 * 1024
+
+
+########################################################################################################################
+# The LRU Cache of parsed DataStructure objects
+########################################################################################################################
+class ParseCache:
+    """ Bounded LRU cache of parsed objects keyed by digest of parsed data """
+
+    __slots__ = ('maxsize', 'hits', 'misses', 'evictions', '_items', '_lock')
+
+    def __init__(self, maxsize: int = 256) -> None:
+
+        assert maxsize > 0
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def key(data: bytes, offset: int = 0, length: Optional[int] = None) -> tuple:
+        # hashlib is imported on first use to not slow down the import of package
+        from hashlib import blake2b
+        view = memoryview(data)[offset:] if length is None else memoryview(data)[offset: offset + length]
+        return len(view), blake2b(view, digest_size=16).digest()
+
+    def get(self, key: tuple) -> Any:
+        with self._lock:
+            obj = self._items.get(key)
+            if obj is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._items.move_to_end(key)
+            return obj
+
+    def put(self, key: tuple, obj: Any) -> None:
+        with self._lock:
+            self._items[key] = obj
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._items), 'maxsize': self.maxsize}
+
+
+########################################################################################################################
+# The on-disk Cache of compiled plans of DataStructure classes
+########################################################################################################################
+class PlanCache:
+    """ The compiled plans (layout, static size, default image) of classes defined in one module
+
+    The plans are stored in JSON file in __pycache__ directory next to the module (or in sys.pycache_prefix).
+    Every plan is stored with fingerprint of class schema, the plan with other fingerprint is discarded.
+    """
+
+    __slots__ = ('path', 'plans', 'dirty')
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.dirty = False
+        try:
+            import json
+            with open(path, 'r') as f:
+                self.plans = json.load(f)
+            if not isinstance(self.plans, dict):
+                raise ValueError()
+        except (OSError, ValueError):
+            self.plans = {}
+
+    def get(self, name: str, fingerprint: str) -> dict:
+        """ Return the plan of class (the plan is empty if it's not cached or the schema has been changed) """
+        plan = self.plans.get(name)
+        if not isinstance(plan, dict) or plan.get('fingerprint') != fingerprint:
+            plan = self.plans[name] = {'fingerprint': fingerprint}
+        return plan
+
+    def update(self) -> None:
+        """ Mark the plans as modified, they will be saved at exit """
+        self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty or sys.dont_write_bytecode:
+            return
+        self.dirty = False
+        temp_path = '{}.{}'.format(self.path, os.getpid())
+        try:
+            import json
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump(self.plans, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # the cache directory isn't writable, the plans are compiled again next time
+            pass
+
+
+PLAN_CACHES = {}
+
+
+def get_plan_path(module: str) -> Optional[str]:
+    """ Return the path of file with plans of classes defined in module, None if the module has not file """
+    file = getattr(sys.modules.get(module), '__file__', None)
+    if not file:
+        return None
+
+    directory, name = os.path.split(os.path.abspath(file))
+    name = "{}.plans-{}.json".format(os.path.splitext(name)[0], PLAN_VERSION)
+    prefix = getattr(sys, 'pycache_prefix', None)
+    if prefix:
+        return os.path.join(prefix, directory.lstrip(os.sep), name)
+    return os.path.join(directory, '__pycache__', name)
+
+
+def get_plan_cache(module: str) -> Optional[PlanCache]:
+    """ Return the plan cache of module, created once per module """
+    if not PLAN_CACHE_ENABLED:
+        return None
+
+    if module not in PLAN_CACHES:
+        if not PLAN_CACHES:
+            import atexit
+            atexit.register(save_plans)
+        path = get_plan_path(module)
+        PLAN_CACHES[module] = PlanCache(path) if path else None
+
+    return PLAN_CACHES[module]
+
+
+def save_plans() -> None:
+    """ Write modified plans on disk (called automatically at exit if the cache is used) """
+    for cache in PLAN_CACHES.values():
+        if cache is not None:
+            cache.save()
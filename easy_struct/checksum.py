@@ -0,0 +1,149 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import zlib
+from threading import Lock
+from typing import Optional, Any
+from easy_struct.file_data import FileBytes
+
+
+# The minimal size of data for parallel CRC calculation
+PARALLEL_THRESHOLD = 8 * 1024 * 1024
+# The size of data chunk processed by one thread
+PARALLEL_CHUNK_SIZE = 4 * 1024 * 1024
+
+CRC32_POLY = 0xEDB88320
+
+
+########################################################################################################################
+# Helper functions for CRC32 combination (the same algorithm as crc32_combine() in zlib)
+########################################################################################################################
+def multmodp(a: int, b: int) -> int:
+    """ Multiply a(x) by b(x) modulo p(x), where p(x) is the CRC polynomial (reflected) """
+    m = 1 << 31
+    p = 0
+    while True:
+        if a & m:
+            p ^= b
+            if (a & (m - 1)) == 0:
+                break
+        m >>= 1
+        b = (b >> 1) ^ CRC32_POLY if b & 1 else b >> 1
+    return p
+
+
+def gen_x2n_table() -> list:
+    table = [1 << 30]
+    for _ in range(31):
+        table.append(multmodp(table[-1], table[-1]))
+    return table
+
+
+X2N_TABLE = gen_x2n_table()
+
+
+def x2nmodp(n: int, k: int) -> int:
+    """ Return x^(n * 2^k) modulo p(x) """
+    p = 1 << 31
+    while n:
+        if n & 1:
+            p = multmodp(X2N_TABLE[k & 31], p)
+        n >>= 1
+        k += 1
+    return p
+
+
+def crc32_combine(crc1: int, crc2: int, len2: int) -> int:
+    """ Return CRC32 of joined data blocks from CRC32 of first block, CRC32 of second block and its length """
+    return multmodp(x2nmodp(len2, 3), crc1) ^ (crc2 & 0xFFFFFFFF)
+
+
+########################################################################################################################
+# Checksum functions for Bytes values
+########################################################################################################################
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor() -> Any:
+    """ Return the shared thread pool (concurrent.futures is imported on first use) """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='crc32')
+        return _executor
+
+
+def crc32(data: Any, value: int = 0, workers: Optional[int] = None) -> int:
+    """ Calculate CRC32 of bytes-like object or FileBytes (streamed in chunks)
+
+    The data bigger than PARALLEL_THRESHOLD are split into chunks, which CRCs are calculated by thread pool
+    (zlib releases GIL) and combined together.
+
+    :param data: The bytes, bytearray, memoryview or FileBytes
+    :param value: The starting value of CRC
+    :param workers: The max count of threads, by default count of CPUs (1 = calculate in current thread)
+    :return: The CRC32 value
+    """
+    workers = workers or os.cpu_count() or 1
+    length = len(data)
+
+    if workers < 2 or length < PARALLEL_THRESHOLD:
+        if isinstance(data, FileBytes):
+            for chunk in data.chunks():
+                value = zlib.crc32(chunk, value)
+            return value
+        return zlib.crc32(data, value)
+
+    if isinstance(data, FileBytes) and not data.materialized:
+        calc = lambda offset: zlib.crc32(data.source.read(data.offset + offset,
+                                                          min(PARALLEL_CHUNK_SIZE, length - offset)))
+    else:
+        view = memoryview(data.data if isinstance(data, FileBytes) else data).cast('B')
+        calc = lambda offset: zlib.crc32(view[offset: offset + PARALLEL_CHUNK_SIZE])
+
+    offsets = range(0, length, PARALLEL_CHUNK_SIZE)
+    executor = get_executor()
+    # limit count of chunks in progress (count of file chunks in memory)
+    for i in range(0, len(offsets), workers):
+        for offset, crc in zip(offsets[i: i + workers], executor.map(calc, offsets[i: i + workers])):
+            value = crc32_combine(value, crc, min(PARALLEL_CHUNK_SIZE, length - offset))
+
+    return value
+
+
+def crc32_segments(segments: list, start: int, end: int, value: int = 0) -> int:
+    """ Calculate CRC32 of data range in list of segments (bytes-like objects or FileBytes) as if they were joined
+
+    :param segments: The list of data segments
+    :param start: The start offset of range in joined data
+    :param end: The end offset of range in joined data
+    :param value: The starting value of CRC
+    :return: The CRC32 value
+    """
+    offset = 0
+    for data in segments:
+        size = len(data)
+        if offset + size > start and offset < end:
+            if offset >= start and offset + size <= end:
+                value = crc32(data, value)
+            else:
+                value = crc32(data[max(start - offset, 0): min(end - offset, size)], value)
+        offset += size
+        if offset >= end:
+            break
+
+    return value
@@ -0,0 +1,230 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import zlib
+from typing import Optional, Union, Iterator, Any
+from easy_struct.file_data import FileBytes, CHUNK_SIZE
+from easy_struct.checksum import crc32
+
+# The compression methods by tag value (the numbering of U-Boot image header)
+COMPRESSION_METHODS = {0: 'none', 1: 'gzip', 2: 'bzip2', 3: 'lzma'}
+
+
+########################################################################################################################
+# The compression codecs (bz2 and lzma modules are optional parts of Python, they are imported when used)
+########################################################################################################################
+def gzip_decompressor() -> Any:
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def gzip_compress(data: bytes) -> bytes:
+    # the gzip header without timestamp, so the same data are compressed always into the same bytes
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def bzip2_decompressor() -> Any:
+    import bz2
+    return bz2.BZ2Decompressor()
+
+
+def bzip2_compress(data: bytes) -> bytes:
+    import bz2
+    return bz2.compress(data)
+
+
+def lzma_decompressor() -> Any:
+    import lzma
+    return lzma.LZMADecompressor(lzma.FORMAT_AUTO)
+
+
+def lzma_compress(data: bytes) -> bytes:
+    # the legacy .lzma format used by U-Boot
+    import lzma
+    return lzma.compress(data, lzma.FORMAT_ALONE)
+
+
+CODECS = {
+    'gzip': (gzip_decompressor, gzip_compress),
+    'bzip2': (bzip2_decompressor, bzip2_compress),
+    'lzma': (lzma_decompressor, lzma_compress),
+}
+
+
+def get_codec(method: Optional[str]) -> tuple:
+    if method not in CODECS:
+        raise ValueError("Unsupported compression method: {}".format(method))
+    return CODECS[method]
+
+
+########################################################################################################################
+# The compressed data as value of Compressed item
+########################################################################################################################
+class CompressedData:
+    """ The compressed data decompressed on demand
+
+    The compressed data are exported without change until the decompressed data are replaced or the compression
+    method is changed. The decompressed data can be streamed in chunks (CRC, search) without decompression into
+    memory. The length, indexing and iteration work with compressed data as they are stored.
+
+    The data are compared and hashed by decompressed data. The data without compression method (not parsed or
+    exported yet) can't be decompressed, they are compared and hashed by compressed data.
+    """
+
+    __slots__ = ('method', '_compressed', '_data')
+
+    def __init__(self, compressed: Union[bytes, bytearray, FileBytes, None] = None, method: Optional[str] = None,
+                 data: Optional[bytes] = None) -> None:
+        """
+        :param compressed: The compressed data (FileBytes are not read into memory)
+        :param method: The compression method ('none', 'gzip', 'bzip2', 'lzma'), set by tag item in export if None
+        :param data: The decompressed data (compressed in export)
+        """
+        assert compressed is None or data is None
+        self.method = method
+        self._compressed = bytearray() if compressed is None and data is None else compressed
+        self._data = None if data is None else bytes(data)
+
+    @property
+    def modified(self) -> bool:
+        """ True if the decompressed data are not compressed yet """
+        return self._compressed is None
+
+    @property
+    def data(self) -> bytes:
+        """ The decompressed data (cached) """
+        if self._data is None:
+            if self.method == 'none':
+                self._data = bytes(self._compressed)
+            else:
+                self._data = b''.join(self.chunks())
+        return self._data
+
+    @data.setter
+    def data(self, value: bytes) -> None:
+        self._data = bytes(value)
+        self._compressed = None
+
+    def compressed(self, method: Optional[str] = None) -> Union[bytearray, FileBytes]:
+        """ Return the compressed data, the data are compressed again only if modified or method is changed """
+        method = self.method if method is None else method
+        if self._compressed is not None and method != self.method and self.method is not None:
+            self._data = self.data
+            self._compressed = None
+        if self._compressed is None:
+            if method is None:
+                raise ValueError("The compression method is not defined")
+            self._compressed = bytearray(self._data if method == 'none' else get_codec(method)[1](self._data))
+        self.method = method
+        return self._compressed
+
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """ Iterate the decompressed data in chunks without decompressing all into memory """
+        if self._data is not None:
+            for offset in range(0, len(self._data), size):
+                yield self._data[offset: offset + size]
+            return
+
+        if self.method is None:
+            if self._compressed:
+                raise ValueError("The compression method is not defined")
+            return
+
+        if self.method == 'none':
+            source = self._compressed
+            for offset in range(0, len(source), size):
+                yield bytes(source[offset: offset + size])
+            return
+
+        decompressor = get_codec(self.method)[0]()
+        if isinstance(self._compressed, FileBytes):
+            source = self._compressed.chunks(size)
+        else:
+            view = memoryview(self._compressed)
+            source = (view[offset: offset + size] for offset in range(0, len(view), size))
+        for chunk in source:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        if hasattr(decompressor, 'flush'):
+            data = decompressor.flush()
+            if data:
+                yield data
+
+    def size(self) -> int:
+        """ Return the size of decompressed data """
+        return sum(len(chunk) for chunk in self.chunks())
+
+    def crc32(self, value: int = 0) -> int:
+        """ Return the CRC32 of decompressed data """
+        for chunk in self.chunks():
+            value = crc32(chunk, value)
+        return value
+
+    def find(self, sub: bytes) -> int:
+        """ Return the offset of the first occurrence of sub in decompressed data or -1 """
+        offset = 0
+        tail = b''
+        for chunk in self.chunks():
+            data = tail + bytes(chunk)
+            index = data.find(sub)
+            if index >= 0:
+                return offset - len(tail) + index
+            tail = data[-(len(sub) - 1):] if len(sub) > 1 else b''
+            offset += len(chunk)
+        return -1
+
+    def copy(self) -> 'CompressedData':
+        obj = CompressedData.__new__(CompressedData)
+        obj.method = self.method
+        obj._compressed = bytearray(self._compressed) if isinstance(self._compressed, bytearray) else \
+            self._compressed
+        obj._data = self._data
+        return obj
+
+    def __len__(self):
+        return len(self.compressed())
+
+    def __repr__(self):
+        return "CompressedData(method={}, length={})".format(self.method, len(self._compressed)
+                                                              if self._compressed is not None else None)
+
+    def __bytes__(self):
+        return bytes(self.compressed())
+
+    def __getitem__(self, key):
+        return self.compressed()[key]
+
+    def __iter__(self):
+        return iter(self.compressed())
+
+    @property
+    def defined(self) -> bool:
+        """ True if the decompressed data are available (they are set or the compression method is known) """
+        return self._data is not None or self.method is not None
+
+    def __eq__(self, obj):
+        if isinstance(obj, CompressedData):
+            if self.defined != obj.defined:
+                return False
+            if self._compressed is not None and obj._compressed is not None and self.method == obj.method and \
+               self._compressed == obj._compressed:
+                return True
+            return self.defined and self.data == obj.data
+        if isinstance(obj, (bytes, bytearray, memoryview, FileBytes)):
+            return self.data == obj if self.defined else self._compressed == obj
+        return False
+
+    def __hash__(self):
+        return hash(self.data if self.defined else bytes(self._compressed))
@@ -12,3 +12,205 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+
+from typing import Optional, Any
+from easy_enum import Enum
+from easy_struct.base_class import MetaStructure, Struct, Union
+from easy_struct.base_types import IntBits, Int, Float, String, Bytes, Compressed, Array
+
+
+########################################################################################################################
+# Helper functions
+########################################################################################################################
+def import_arrow() -> Any:
+    """ Return the pyarrow module (optional dependency, imported when used) """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("The Arrow conversion requires 'pyarrow' package: pip install pyarrow") from None
+    return pyarrow
+
+
+def is_enum(choices: Any) -> bool:
+    return isinstance(choices, type) and issubclass(choices, Enum)
+
+
+def int_type(pa: Any, bits: int, signed: bool) -> Any:
+    """ Return the smallest Arrow integer type for integer of bits """
+    for width in (8, 16, 32, 64):
+        if bits <= width:
+            return getattr(pa, '{}int{}'.format('' if signed else 'u', width))()
+    raise TypeError("The integer of {} bits has not Arrow type".format(bits))
+
+
+########################################################################################################################
+# The Arrow schema of DataStructure
+########################################################################################################################
+def arrow_type(metadata: Any) -> Any:
+    """ Return the Arrow data type of item
+
+    The integers are mapped by width and sign, the items with Enum choices into dictionary of labels,
+    Bytes with static length into fixed size binary and Arrays with static length into fixed size lists.
+    """
+    pa = import_arrow()
+
+    if isinstance(metadata, (Int, IntBits)):
+        if is_enum(metadata.choices):
+            return pa.dictionary(pa.int32(), pa.string())
+        return int_type(pa, metadata.bytes * 8 if isinstance(metadata, Int) else metadata.bits, metadata.signed)
+
+    if isinstance(metadata, Float):
+        return {2: pa.float16, 4: pa.float32, 8: pa.float64}[metadata.bytes]()
+
+    if isinstance(metadata, String):
+        return pa.string()
+
+    if isinstance(metadata, Compressed):
+        return pa.binary()
+
+    if isinstance(metadata, Bytes):
+        return pa.binary(metadata.length) if isinstance(metadata.length, int) else pa.binary()
+
+    if isinstance(metadata, Array):
+        itype = metadata.item_type
+        value_type = pa.struct(list(arrow_schema(itype))) if Array.is_struct(itype) else arrow_type(itype)
+        return pa.list_(value_type, metadata.length) if isinstance(metadata.length, int) else pa.list_(value_type)
+
+    if isinstance(metadata, Struct):
+        return pa.struct(list(arrow_schema(metadata.struct)))
+
+    raise TypeError("The item '{}' has not Arrow type".format(type(metadata).__name__))
+
+
+def arrow_schema(cls: MetaStructure) -> Any:
+    """ Return the Arrow schema of DataStructure class (the item descriptions are stored as field metadata) """
+    pa = import_arrow()
+
+    fields = []
+    for name, metadata in getattr(cls, '__annotations__', {}).items():
+        if isinstance(metadata, Union):
+            raise TypeError("The Union item '{}' of class '{}' has not Arrow type".format(name, cls.__name__))
+        desc = metadata.description
+        fields.append(pa.field(name, arrow_type(metadata), False, {'description': desc} if desc else None))
+    return pa.schema(fields)
+
+
+########################################################################################################################
+# The conversion of values
+########################################################################################################################
+def to_column(metadata: Any, values: list) -> list:
+    """ Convert the item values into values accepted by Arrow array of item type """
+    if isinstance(metadata, (Int, IntBits)) and is_enum(metadata.choices):
+        return [metadata.choices[value] for value in values]
+    if isinstance(metadata, Bytes):
+        return [bytes(value) for value in values]
+    if isinstance(metadata, Struct):
+        return [to_record(value) for value in values]
+    if isinstance(metadata, Array):
+        if Array.is_struct(metadata.item_type):
+            return [[to_record(obj) for obj in value] for value in values]
+        return [to_column(metadata.item_type, value) for value in values]
+    return values
+
+
+def to_record(obj: Any) -> dict:
+    """ Return the values of object as dict accepted by Arrow struct array """
+    items = obj.__class__.__annotations__
+    return {name: to_column(metadata, [getattr(obj, name)])[0] for name, metadata in items.items()}
+
+
+def from_column(metadata: Any, values: list) -> list:
+    """ Convert the values of Arrow column (as Python list) into item values """
+    if isinstance(metadata, (Int, IntBits)) and is_enum(metadata.choices):
+        return [metadata.choices[label] for label in values]
+    if isinstance(metadata, Struct):
+        return [from_record(metadata.struct, value) for value in values]
+    if isinstance(metadata, Array):
+        if Array.is_struct(metadata.item_type):
+            return [[from_record(metadata.item_type, record) for record in value] for value in values]
+        return [from_column(metadata.item_type, value) for value in values]
+    return values
+
+
+def from_record(cls: MetaStructure, record: dict) -> Any:
+    """ Return the object with values from dict of Arrow struct array """
+    items = cls.__annotations__
+    return cls(**{name: from_column(metadata, [record[name]])[0] for name, metadata in items.items()})
+
+
+def arrow_array(pa: Any, metadata: Any, values: list) -> Any:
+    """ Return the Arrow array of item values """
+    choices = getattr(metadata, 'choices', None)
+    if is_enum(choices):
+        labels = [label for label, _, _ in choices]
+        index = {value: i for i, (_, value, _) in enumerate(choices)}
+        try:
+            indices = [index[value] for value in values]
+        except KeyError as e:
+            raise ValueError("The value {} is not in choices of '{}'".format(e.args[0], choices.__name__)) from None
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(labels, pa.string()))
+
+    return pa.array(to_column(metadata, values), arrow_type(metadata))
+
+
+########################################################################################################################
+# The conversion of binary records into Arrow record batches and back
+########################################################################################################################
+def to_arrow(cls: MetaStructure, data: bytes, count: Optional[int] = None, offset: int = 0) -> Any:
+    """ Return the Arrow record batch of objects with static layout stored one after another
+
+    The records are decoded by columns in one pass (DataStructure.parse_columns). The integer and float columns
+    are decoded without creating objects, the other items (nested structures, arrays, strings and bytes) are
+    unpacked item by item and the nested structures are converted from parsed objects.
+
+    :param cls: The DataStructure class with static layout
+    :param data: The binary data
+    :param count: The count of records, all records until the end of data if None
+    :param offset: The offset of first record
+    """
+    pa = import_arrow()
+
+    layout = cls._get_layout()
+    if layout is None:
+        raise TypeError("Class '{}' has not static layout".format(cls.__name__))
+
+    if count is None:
+        count, rest = divmod(len(data) - offset, layout.size)
+        if rest:
+            raise ValueError("Not enough data: {} bytes of last object at offset {}".format(
+                rest, offset + count * layout.size))
+
+    schema = arrow_schema(cls)
+    columns = layout.columns(data, count, offset)
+    items = cls.__annotations__
+    return pa.RecordBatch.from_arrays([arrow_array(pa, items[name], columns[name]) for name in layout.names],
+                                      schema=schema)
+
+
+def from_arrow(cls: MetaStructure, table: Any) -> bytes:
+    """ Return the binary records of Arrow table or record batch rows (the columns are packed in one pass)
+
+    :param cls: The DataStructure class with static layout
+    :param table: The Arrow table or record batch with columns of class items
+    """
+    layout = cls._get_layout()
+    if layout is None:
+        raise TypeError("Class '{}' has not static layout".format(cls.__name__))
+
+    items = cls.__annotations__
+    names = table.schema.names
+    columns = []
+    for name in layout.names:
+        if name not in names:
+            raise ValueError("The table has not column '{}' of class '{}'".format(name, cls.__name__))
+        columns.append(from_column(items[name], table.column(name).to_pylist()))
+
+    for index in layout.checks:
+        metadata = items[layout.names[index]]
+        columns[index] = [metadata.validate(value) for value in columns[index]]
+    for index, _ in layout.converters:
+        metadata = items[layout.names[index]]
+        columns[index] = [metadata.pack(value) for value in columns[index]]
+
+    pack = layout.codec.pack
+    return b''.join(pack(*row) for row in zip(*columns))
@@ -0,0 +1,185 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Optional, Union, Iterator, Callable
+from easy_struct.base_class import MetaStructure, DataStructure
+
+
+########################################################################################################################
+# The incremental Decoder of DataStructure objects
+########################################################################################################################
+class Decoder:
+    """ Push-based decoder of DataStructure objects from stream of data chunks
+
+    Only the unconsumed tail of data is kept, the consumed part is dropped once it exceeds the rest of buffer.
+    The size of next object is known as soon as the items which the size depends on arrive.
+
+    The tolerant decoder doesn't raise exception if parsing of object fails. The error is reported with its offset
+    in stream and the decoder continues with the next plausible object: the next position where all constant items
+    (items with single choice, e.g. magic number) match, or the next byte if the class has no constant item.
+    The decoder in default mode drops the data of object which can't be parsed and raises the exception. If the size
+    of object can't be measured (e.g. unknown union tag) or exceeds max_size, the decoder stays at the object and
+    raises the same exception for all next data until reset().
+    """
+
+    __slots__ = ('cls', 'records', 'tolerant', 'max_size', 'on_error', 'errors', 'failures', 'skipped',
+                 '_buffer', '_start', '_static', '_required', '_dropped', '_signatures', '_error')
+
+    def __init__(self, cls: MetaStructure, tolerant: bool = False, max_size: Optional[int] = None,
+                 on_error: Optional[Callable[[int, Exception], None]] = None) -> None:
+        """
+        :param cls: The DataStructure class
+        :param tolerant: Skip the data of objects which can't be parsed instead of raising exception
+        :param max_size: The maximal size of object, the bigger size is handled as parsing error
+        :param on_error: The function called with stream offset and exception of failed object in tolerant mode,
+                         the errors are collected in errors list if not specified
+        """
+        assert issubclass(cls, DataStructure)
+
+        self.cls = cls
+        self.records = 0
+        self.tolerant = tolerant
+        self.max_size = max_size
+        self.on_error = on_error
+        self.errors = []
+        self.failures = 0
+        self.skipped = 0
+        self._buffer = bytearray()
+        self._start = 0
+        self._static = cls._static_size()
+        self._required = self._static
+        self._dropped = 0
+        self._signatures = cls._signatures()
+        self._error = None
+
+    def __len__(self):
+        """ The count of unconsumed bytes """
+        return len(self._buffer) - self._start
+
+    def __iter__(self) -> Iterator[DataStructure]:
+        return self._decode()
+
+    @property
+    def offset(self) -> int:
+        """ The offset of next object in stream """
+        return self._dropped + self._start
+
+    @property
+    def required(self) -> Optional[int]:
+        """ The size of next object if known, otherwise None """
+        if self._required is None:
+            self._required = self.cls._measure(self._buffer, self._start)[0]
+        return self._required
+
+    def feed(self, chunk: Union[bytes, bytearray, memoryview]) -> Iterator[DataStructure]:
+        """ Append data chunk and return iterator of complete objects
+
+        The objects not taken from iterator stay in buffer for next call.
+        If parsing of object fails, its data are dropped and exception is raised from iterator.
+
+        :param chunk:
+        :return:
+        """
+        if self._start and self._start >= len(self._buffer) - self._start:
+            del self._buffer[:self._start]
+            self._dropped += self._start
+            self._start = 0
+        self._buffer += chunk
+        return self._decode()
+
+    def reset(self) -> None:
+        self._buffer = bytearray()
+        self._start = 0
+        self._required = self._static
+        self._dropped = 0
+        self._error = None
+
+    def _plausible(self) -> bool:
+        """ Check the constant items of next object (True if they are not complete yet) """
+        for offset, raw in self._signatures:
+            start = self._start + offset
+            if start + len(raw) <= len(self._buffer) and self._buffer[start: start + len(raw)] != raw:
+                return False
+        return True
+
+    def _resync(self) -> bool:
+        """ Move to the next plausible object, return False if more data are needed to find it """
+        self._required = self._static
+        if not self._signatures:
+            self._start += 1
+            self.skipped += 1
+            return True
+
+        offset, raw = self._signatures[0]
+        index = self._buffer.find(raw, self._start + offset + 1)
+        if index < 0:
+            # keep the data which can be start of signature
+            start = max(self._start + 1, len(self._buffer) - offset - len(raw) + 1)
+            self.skipped += start - self._start
+            self._start = start
+            return False
+
+        self.skipped += index - offset - self._start
+        self._start = index - offset
+        return True
+
+    def _failed(self, error: Exception) -> None:
+        self.failures += 1
+        if self.on_error is not None:
+            self.on_error(self.offset, error)
+        else:
+            self.errors.append((self.offset, error))
+
+    def _decode(self) -> Iterator[DataStructure]:
+        if self._error is not None:
+            raise self._error
+
+        while True:
+            if self.tolerant and not self._plausible():
+                if not self._resync():
+                    return
+                continue
+
+            try:
+                size = self.required
+                if size is not None and self.max_size is not None and size > self.max_size:
+                    raise ValueError("The object size {} exceeds the limit {}".format(size, self.max_size))
+            except Exception as e:
+                if not self.tolerant:
+                    self._error = e
+                    raise
+                self._failed(e)
+                self._resync()
+                continue
+
+            if size is None or size > len(self):
+                return
+
+            start = self._start
+            if not self.tolerant:
+                self._start += size
+                self._required = self._static
+                obj = self.cls.parse(self._buffer, start)
+            else:
+                try:
+                    obj = self.cls.parse(self._buffer, start)
+                except Exception as e:
+                    self._failed(e)
+                    self._resync()
+                    continue
+                self._start += size
+                self._required = self._static
+
+            self.records += 1
+            yield obj
@@ -0,0 +1,190 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from typing import Optional, Union, Any, Iterator
+
+
+# The size of chunks for streaming reads
+CHUNK_SIZE = 1024 * 1024
+
+
+########################################################################################################################
+# The File as parsing input
+########################################################################################################################
+class FileData:
+    """ The read-only view of binary file used as input for DataStructure.parse()
+
+    The Bytes items with length of min_size or more are not read, they are parsed as FileBytes references.
+    The file opened from path is closed by close() (or at exit of with statement, or when the FileData is
+    released), the file object passed by caller stays open.
+    """
+
+    __slots__ = ('file', 'min_size', 'referenced', '_owner', '_size')
+
+    def __init__(self, file: Any, min_size: int = 64 * 1024) -> None:
+        """
+        :param file: The file path or binary file object opened for reading
+        :param min_size: The minimal size of Bytes item parsed as FileBytes
+        """
+        self._owner = isinstance(file, (str, bytes, os.PathLike))
+        self.file = open(file, 'rb') if self._owner else file
+        self.min_size = min_size
+        # True if FileBytes refer to data of this file
+        self.referenced = False
+        self._size = os.fstat(self.file.fileno()).st_size
+
+    def __enter__(self) -> 'FileData':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __del__(self):
+        if getattr(self, '_owner', False):
+            self.close()
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key: slice) -> bytes:
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("FileData supports only continuous slices")
+        start, stop, _ = key.indices(self._size)
+        return self.read(start, max(stop - start, 0))
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self) -> None:
+        """ Close the file if it was opened from path """
+        if self._owner:
+            self.file.close()
+
+    def read(self, offset: int, length: int) -> bytes:
+        if hasattr(os, 'pread'):
+            data = os.pread(self.fileno(), length, offset)
+        else:
+            self.file.seek(offset)
+            data = self.file.read(length)
+        if len(data) != length:
+            raise ValueError("Not enough data: {} bytes at offset {} required".format(length, offset))
+        return data
+
+    def get_bytes(self, offset: int, length: int) -> 'FileBytes':
+        if offset + length > self._size:
+            raise ValueError("Not enough data: {} bytes at offset {} required".format(length, offset))
+        self.referenced = True
+        return FileBytes(self, offset, length)
+
+
+########################################################################################################################
+# The Bytes value stored in file
+########################################################################################################################
+class FileBytes:
+    """ The reference to data segment in file used as value of Bytes item
+
+    The data are read into memory only when they are accessed as whole or modified, otherwise they are
+    streamed (CRC, export, compare).
+    """
+
+    __slots__ = ('source', 'offset', 'length', '_data')
+
+    def __init__(self, source: Union[FileData, Any], offset: int = 0, length: Optional[int] = None) -> None:
+        """
+        :param source: The FileData, file path or binary file object
+        :param offset: The offset of data in file
+        :param length: The length of data, by default to the end of file
+        """
+        self.source = source if isinstance(source, FileData) else FileData(source)
+        self.offset = offset
+        self.length = len(self.source) - offset if length is None else length
+        self._data = None
+
+    @property
+    def materialized(self) -> bool:
+        return self._data is not None
+
+    def __len__(self):
+        return self.length if self._data is None else len(self._data)
+
+    def __repr__(self):
+        return "FileBytes(offset={}, length={})".format(self.offset, len(self))
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __getitem__(self, key):
+        if self._data is not None:
+            return self._data[key]
+        if isinstance(key, int):
+            if key < 0:
+                key += self.length
+            if not 0 <= key < self.length:
+                raise IndexError("index out of range")
+            return self.source.read(self.offset + key, 1)[0]
+        start, stop, step = key.indices(self.length)
+        data = self.source.read(self.offset + start, max(stop - start, 0))
+        return data if step == 1 else data[::step]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __iadd__(self, value):
+        return self.data + value
+
+    def __add__(self, value):
+        return self.data + value
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __eq__(self, obj):
+        if isinstance(obj, FileBytes) and self._data is None and obj._data is None and \
+           self.source is obj.source and self.offset == obj.offset and self.length == obj.length:
+            return True
+        if not isinstance(obj, (bytes, bytearray, memoryview, FileBytes)) or len(self) != len(obj):
+            return False
+        offset = 0
+        for chunk in self.chunks():
+            if chunk != obj[offset: offset + len(chunk)]:
+                return False
+            offset += len(chunk)
+        return True
+
+    def __hash__(self):
+        return hash(bytes(self))
+
+    @property
+    def data(self) -> bytearray:
+        """ The data read into memory (the file is not read again) """
+        if self._data is None:
+            self._data = bytearray(self.source.read(self.offset, self.length))
+        return self._data
+
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """ Iterate the data in chunks without reading all into memory """
+        if self._data is not None:
+            view = memoryview(self._data)
+            for offset in range(0, len(view), size):
+                yield view[offset: offset + size]
+            return
+
+        for offset in range(0, self.length, size):
+            yield self.source.read(self.offset + offset, min(size, self.length - offset))
+
+    def segment(self) -> Any:
+        """ Return the data for scatter-gather output """
+        return self if self._data is None else memoryview(self._data)
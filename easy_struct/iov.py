@@ -0,0 +1,164 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import errno
+from typing import Any
+from easy_struct.file_data import FileBytes
+
+
+# The minimal size of Bytes value exported as separate segment (smaller data are copied into joined segment)
+IOV_THRESHOLD = 1024
+
+
+########################################################################################################################
+# Helper functions for scatter-gather output
+########################################################################################################################
+def get_iov_max() -> int:
+    """ Return the maximal count of segments written by one system call """
+    try:
+        value = os.sysconf('SC_IOV_MAX')
+    except (AttributeError, ValueError, OSError):
+        value = -1
+    return value if value > 0 else 1024
+
+
+IOV_MAX = get_iov_max()
+
+
+class Segments(list):
+    """ The list of data segments which joins small adjacent segments """
+
+    __slots__ = ('size', '_pending')
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.size = 0
+        self._pending = bytearray()
+
+    def add(self, data: Any) -> None:
+        self.size += len(data)
+        if len(data) < IOV_THRESHOLD and not isinstance(data, FileBytes):
+            self._pending += data
+        else:
+            self.flush()
+            self.append(data)
+
+    def mark(self) -> tuple:
+        """ Return the position of next data as (index of segment, offset in segment) for later patching """
+        return len(self), len(self._pending)
+
+    def patch(self, mark: tuple, data: bytes) -> None:
+        """ Overwrite data at position returned by mark() (after flush) """
+        index, offset = mark
+        self[index][offset: offset + len(data)] = data
+
+    def flush(self) -> 'Segments':
+        if self._pending:
+            self.append(self._pending)
+            self._pending = bytearray()
+        return self
+
+
+def is_socket(target: Any) -> bool:
+    # the socket module is imported by user of socket, so it's not imported here
+    socket = sys.modules.get('socket')
+    return socket is not None and isinstance(target, socket.socket)
+
+
+def get_fd(target: Any) -> int:
+    if hasattr(target, 'flush'):
+        target.flush()
+    return target if isinstance(target, int) else target.fileno()
+
+
+def write_buffers(target: Any, buffers: list) -> int:
+    """ Write list of bytes-like objects by one system call (os.writev or socket.sendmsg) per IOV_MAX buffers """
+    if is_socket(target):
+        write = target.sendmsg
+    elif hasattr(os, 'writev'):
+        fd = get_fd(target)
+        write = lambda views: os.writev(fd, views)
+    else:
+        fd = get_fd(target)
+        write = lambda views: os.write(fd, views[0])
+
+    views = [memoryview(data).cast('B') for data in buffers if len(data)]
+    total = 0
+    index = 0
+    while index < len(views):
+        count = write(views[index: index + IOV_MAX])
+        total += count
+        # skip written segments and the written part of partially written segment
+        while index < len(views) and count >= len(views[index]):
+            count -= len(views[index])
+            index += 1
+        if count:
+            views[index] = views[index][count:]
+
+    return total
+
+
+def write_file_bytes(target: Any, value: FileBytes) -> int:
+    """ Copy data segment from file into target inside kernel (copy_file_range, sendfile) if possible """
+    if is_socket(target):
+        return target.sendfile(value.source.file, value.offset, value.length)
+
+    out_fd = get_fd(target)
+    in_fd = value.source.fileno()
+    end = value.offset + value.length
+    for method in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, method):
+            continue
+        offset = value.offset
+        try:
+            while offset < end:
+                if method == 'copy_file_range':
+                    count = os.copy_file_range(in_fd, out_fd, end - offset, offset)
+                else:
+                    count = os.sendfile(out_fd, in_fd, offset, end - offset)
+                if count == 0:
+                    raise ValueError("Unexpected end of file at offset {}".format(offset))
+                offset += count
+            return value.length
+        except OSError as e:
+            # not supported for this kind of files, try other method
+            if offset != value.offset or e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.ENOTSUP,
+                                                          errno.EOPNOTSUPP, errno.EBADF):
+                raise
+
+    for chunk in value.chunks():
+        write_buffers(out_fd, [chunk])
+    return value.length
+
+
+def write_iov(target: Any, segments: list) -> int:
+    """ Write data segments into file descriptor, file object or socket without joining them
+
+    :param target: The file descriptor, file object (with fileno() method) or socket
+    :param segments: The list of bytes-like objects and FileBytes references
+    :return: The count of written bytes
+    """
+    total = 0
+    buffers = []
+    for data in segments:
+        if isinstance(data, FileBytes):
+            total += write_buffers(target, buffers)
+            total += write_file_bytes(target, data)
+            buffers = []
+        else:
+            buffers.append(data)
+
+    return total + write_buffers(target, buffers)
@@ -0,0 +1,149 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from struct import Struct as Codec
+from typing import Optional
+from easy_struct.base_types import IntBits, Int, Float
+
+
+########################################################################################################################
+# Helper functions
+########################################################################################################################
+INT_FORMATS = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+FLOAT_FORMATS = {2: 'e', 4: 'f', 8: 'd'}
+
+
+def is_natural(metadata: Int) -> bool:
+    """ Return True if Int item accepts any value of its size (no need to validate unpacked value) """
+    bits = metadata.bytes * 8
+    min_value = -(1 << (bits - 1)) if metadata.signed else 0
+    max_value = (1 << (bits - 1)) - 1 if metadata.signed else (1 << bits) - 1
+    return metadata.choices is None and metadata.min_value == min_value and metadata.max_value == max_value
+
+
+def get_endian(items: dict) -> str:
+    for metadata in items.values():
+        if isinstance(metadata, (Int, Float)) and metadata.size > 1:
+            return metadata.endian
+    return 'little'
+
+
+########################################################################################################################
+# The static Layout of DataStructure
+########################################################################################################################
+class Layout:
+    """ The precompiled layout of DataStructure with static size
+
+    All items are unpacked by single codec (struct.Struct), items without native format are unpacked
+    as raw bytes and converted by item's unpack method.
+    """
+
+    __slots__ = ('names', 'offsets', 'size', 'endian', 'codec', 'converters', 'checks')
+
+    def __init__(self, items: dict) -> None:
+
+        self.names = tuple(items.keys())
+        self.offsets = {}
+        self.endian = get_endian(items)
+        self.converters = []
+        self.checks = []
+
+        fmt = {'little': '<', 'big': '>'}[self.endian]
+        offset = 0
+        for index, (name, metadata) in enumerate(items.items()):
+            if metadata.offset:
+                fmt += '{}x'.format(metadata.offset)
+                offset += metadata.offset
+            size = metadata.size
+            if isinstance(metadata, Int) and size in INT_FORMATS and (size == 1 or metadata.endian == self.endian):
+                code = INT_FORMATS[size]
+                fmt += code if metadata.signed else code.upper()
+                if not is_natural(metadata):
+                    self.checks.append(index)
+            elif isinstance(metadata, Float) and metadata.endian == self.endian:
+                fmt += FLOAT_FORMATS[size]
+                self.checks.append(index)
+            else:
+                fmt += '{}s'.format(size)
+                self.converters.append((index, metadata.unpack))
+                if not isinstance(metadata, Int) or not is_natural(metadata):
+                    self.checks.append(index)
+            self.offsets[name] = offset
+            offset += size
+
+        self.codec = Codec(fmt)
+        self.size = self.codec.size
+        assert self.size == offset
+
+    def plan(self) -> dict:
+        """ Return the compiled layout as JSON serializable dict """
+        fmt = self.codec.format
+        return {'format': fmt.decode() if isinstance(fmt, bytes) else fmt, 'names': self.names,
+                'offsets': self.offsets, 'endian': self.endian,
+                'converters': [index for index, _ in self.converters], 'checks': self.checks}
+
+    @classmethod
+    def from_plan(cls, items: dict, plan: dict) -> 'Layout':
+        """ Create the layout from dict returned by plan() without compiling it again """
+        layout = cls.__new__(cls)
+        layout.names = tuple(plan['names'])
+        layout.offsets = dict(plan['offsets'])
+        layout.endian = plan['endian']
+        layout.codec = Codec(plan['format'])
+        layout.size = layout.codec.size
+        layout.converters = [(index, items[layout.names[index]].unpack) for index in plan['converters']]
+        layout.checks = list(plan['checks'])
+        return layout
+
+    @classmethod
+    def build(cls, items: dict) -> Optional['Layout']:
+        """ Return the layout of items or None if any item has not static size """
+        if not items:
+            return None
+
+        for metadata in items.values():
+            if isinstance(metadata, IntBits) or isinstance(getattr(metadata, 'length', None), str) or \
+               not isinstance(getattr(metadata, 'size', None), int):
+                return None
+
+        return cls(items)
+
+    def _iter(self, data: bytes, count: int, offset: int = 0):
+        if len(data) < offset + count * self.size:
+            raise ValueError("Not enough data for {} records of size {}".format(count, self.size))
+        return self.codec.iter_unpack(memoryview(data)[offset: offset + count * self.size])
+
+    def rows(self, data: bytes, count: int, offset: int = 0) -> list:
+        """ Unpack values of count records in one pass as list of rows """
+        rows = self._iter(data, count, offset)
+        if not self.converters:
+            return list(rows)
+
+        values = []
+        for row in rows:
+            row = list(row)
+            for index, unpack in self.converters:
+                row[index] = unpack(row[index])
+            values.append(row)
+        return values
+
+    def columns(self, data: bytes, count: int, offset: int = 0) -> dict:
+        """ Unpack values of count records in one pass as dict of columns """
+        columns = [list(column) for column in zip(*self._iter(data, count, offset))]
+        if not columns:
+            return {name: [] for name in self.names}
+
+        for index, unpack in self.converters:
+            columns[index] = [unpack(value) for value in columns[index]]
+        return dict(zip(self.names, columns))
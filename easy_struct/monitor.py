@@ -0,0 +1,249 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+from time import perf_counter
+from threading import Lock, get_ident
+from operator import itemgetter
+from typing import Optional, Any, Callable
+from easy_struct.base_types import IntBits
+
+
+########################################################################################################################
+# The base Monitor of DataStructure activity
+########################################################################################################################
+class Monitor:
+    """ The observer of parse/export activity of DataStructure classes
+
+    The monitor is attached to classes by attach() method (attached to DataStructure observes all classes).
+    The classes without monitor only check that their monitor is None, they don't measure anything.
+    """
+
+    def attach(self, *classes: Any) -> 'Monitor':
+        for cls in classes:
+            cls._monitor_ = self
+        return self
+
+    def detach(self, *classes: Any) -> None:
+        for cls in classes:
+            if cls.__dict__.get('_monitor_') is self:
+                delattr(cls, '_monitor_')
+                if not hasattr(cls, '_monitor_'):
+                    cls._monitor_ = None
+
+    def record(self, cls: Any, operation: str, offset: Optional[int], length: Optional[int], start: float,
+               duration: float, error: Optional[Exception] = None) -> None:
+        """ Called after operation with whole object (parse, export, validate, update, compute, info)
+
+        :param cls: The DataStructure class
+        :param operation: The name of operation
+        :param offset: The offset of object in parsed data (None if the operation doesn't work with data)
+        :param length: The count of parsed or exported bytes (None if the operation failed or doesn't produce data)
+        :param start: The perf_counter() value at start of operation
+        :param duration: The duration of operation in seconds
+        :param error: The exception raised by operation
+        """
+        pass
+
+    def item(self, cls: Any, operation: str, name: str, offset: int, length: int, start: float,
+             duration: float, error: Optional[Exception] = None) -> None:
+        """ Called after parse or export of one item (the offset is relative to object start for export)
+
+        The length of IntBits item is the count of its bits, the length of other items is the count of bytes.
+        """
+        pass
+
+    def call(self, cls: Any, operation: str, offset: Optional[int], method: Callable, *args) -> Any:
+        """ Call the method of operation and record its duration and result """
+        start = perf_counter()
+        try:
+            result = method(*args)
+        except Exception as e:
+            self.record(cls, operation, offset, None, start, perf_counter() - start, e)
+            raise
+        duration = perf_counter() - start
+        if isinstance(result, tuple):
+            length = result[1]
+        elif isinstance(result, list):
+            length = getattr(result, 'size', None) or sum(len(data) for data in result)
+        else:
+            length = None
+        self.record(cls, operation, offset, length, start, duration)
+        return result
+
+    def parsed(self, cls: Any, name: str, metadata: Any, value: Any, offset: int, length: int, start: float,
+               duration: float) -> Any:
+        """ Validate parsed value of item, record it and return the validated value
+
+        The monitored objects are created from validated values without validation of items in constructor.
+        The duration doesn't include the validation.
+        """
+        try:
+            value = metadata.validate(value)
+        except (TypeError, ValueError) as e:
+            self.item(cls, 'parse', name, offset, length, start, duration, e)
+            raise
+        self.item(cls, 'parse', name, offset, length, start, duration)
+        return value
+
+
+########################################################################################################################
+# The Metrics counters
+########################################################################################################################
+CLASS_COUNTERS = ('parsed', 'parsed_bytes', 'parse_time', 'exported', 'exported_bytes', 'export_time',
+                  'validate_time', 'update_time', 'compute_time', 'info_time', 'validation_failures', 'errors')
+
+ITEM_COUNTERS = ('parsed', 'parsed_bytes', 'parsed_bits', 'parse_time', 'exported', 'exported_bytes', 'exported_bits',
+                 'export_time', 'validation_failures')
+
+RECORD_COUNTERS = {'parse': ('parsed', 'parsed_bytes'), 'export': ('exported', 'exported_bytes')}
+
+
+class Metrics(Monitor):
+    """ The counters of parsed and exported records, bytes, validation failures and cumulative time
+
+    The counters are collected per class and per item. The time of object includes the time of its items
+    and nested structures. The IntBits items count bits instead of bytes.
+
+    Usage:
+        metrics = Metrics().attach(ImgHeader, UImage)
+        ...
+        print(metrics.snapshot())
+    """
+
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None) -> None:
+        """
+        :param callback: The function called after every parsed or exported object with dict of its metrics:
+                         class, operation, offset, bytes, time and error (message or None)
+        """
+        self.callback = callback
+        self._classes = {}
+        self._lock = Lock()
+
+    def _counters(self, cls: Any) -> dict:
+        counters = self._classes.get(cls)
+        if counters is None:
+            counters = self._classes[cls] = dict.fromkeys(CLASS_COUNTERS, 0)
+            counters['items'] = {}
+        return counters
+
+    def record(self, cls, operation, offset, length, start, duration, error=None):
+        with self._lock:
+            counters = self._counters(cls)
+            counters[operation + '_time'] += duration
+            if operation in RECORD_COUNTERS:
+                if error is None:
+                    count, size = RECORD_COUNTERS[operation]
+                    counters[count] += 1
+                    counters[size] += length
+                else:
+                    counters['errors'] += 1
+            elif error is not None and operation == 'validate':
+                counters['validation_failures'] += 1
+
+        if self.callback is not None and operation in RECORD_COUNTERS:
+            self.callback({'class': cls.__name__, 'operation': operation, 'offset': offset, 'bytes': length,
+                           'time': duration, 'error': None if error is None else str(error) or type(error).__name__})
+
+    def item(self, cls, operation, name, offset, length, start, duration, error=None):
+        unit = '_bits' if isinstance(cls.__annotations__.get(name), IntBits) else '_bytes'
+        with self._lock:
+            counters = self._counters(cls)
+            items = counters['items']
+            if name not in items:
+                items[name] = dict.fromkeys(ITEM_COUNTERS, 0)
+            counters = items[name]
+            if operation == 'parse':
+                counters['parse_time'] += duration
+                if error is None:
+                    counters['parsed'] += 1
+                    counters['parsed' + unit] += length
+                else:
+                    counters['validation_failures'] += 1
+                    self._counters(cls)['validation_failures'] += 1
+            else:
+                counters['exported'] += 1
+                counters['exported' + unit] += length
+                counters['export_time'] += duration
+
+    def snapshot(self) -> dict:
+        """ Return the copy of counters as dict: {class name: {counter: value, 'items': {item name: {...}}}} """
+        with self._lock:
+            return {cls.__name__: dict(counters, items={name: dict(values) for name, values in
+                                                          counters['items'].items()})
+                    for cls, counters in self._classes.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._classes.clear()
+
+
+########################################################################################################################
+# The Tracer of spans
+########################################################################################################################
+class Tracer(Monitor):
+    """ The recorder of one span per parsed/exported object and item, saved as Chrome trace-event JSON
+
+    The spans of objects have category by operation (parse, export, validate, update, compute, info) and the spans
+    of items by operation with '.item' suffix. The nested structures are shown as spans inside their item span.
+
+    Usage:
+        tracer = Tracer().attach(DataStructure)
+        img = Img.parse_file('image.bin')
+        tracer.detach(DataStructure)
+        tracer.save('trace.json')   # open in chrome://tracing, Perfetto or speedscope
+    """
+
+    def __init__(self) -> None:
+        self.events = []
+        self._start = perf_counter()
+        self._pid = os.getpid()
+
+    def _span(self, name: str, category: str, start: float, duration: float, args: dict,
+              error: Optional[Exception]) -> None:
+        if error is not None:
+            args['error'] = str(error) or type(error).__name__
+        # the list.append is atomic, the spans from more threads don't need a lock
+        self.events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': self._pid, 'tid': get_ident(),
+                            'ts': (start - self._start) * 1e6, 'dur': duration * 1e6,
+                            'args': args})
+
+    def record(self, cls, operation, offset, length, start, duration, error=None):
+        self._span(cls.__name__, operation, start, duration,
+                   {'class': cls.__name__, 'offset': offset, 'length': length}, error)
+
+    def item(self, cls, operation, name, offset, length, start, duration, error=None):
+        unit = 'bits' if isinstance(cls.__annotations__.get(name), IntBits) else 'length'
+        self._span('{}.{}'.format(cls.__name__, name), operation + '.item', start, duration,
+                   {'class': cls.__name__, 'field': name, 'offset': offset, unit: length}, error)
+
+    def trace(self) -> dict:
+        """ Return the spans as Chrome trace-event JSON object """
+        return {'traceEvents': sorted(self.events, key=itemgetter('ts')), 'displayTimeUnit': 'ms'}
+
+    def save(self, file: Any) -> None:
+        """ Write the spans as Chrome trace-event JSON into file
+
+        :param file: The file path or text file object
+        """
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                json.dump(self.trace(), f)
+        else:
+            json.dump(self.trace(), file)
+
+    def clear(self) -> None:
+        self.events = []
+        self._start = perf_counter()
@@ -0,0 +1,239 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+from struct import Struct as Codec
+from typing import Optional, Any, Iterator
+from easy_struct.base_class import MetaStructure, DataStructure
+
+# The ring header: sequence number of next record, count of slots and record size
+HEADER = Codec('<QQQ')
+# The slot stamp: 2 * sequence + 1 while the record is written, 2 * sequence + 2 when it's complete
+STAMP = Codec('<Q')
+
+
+########################################################################################################################
+# Helper functions
+########################################################################################################################
+def attach_memory(name: str) -> Any:
+    """ Attach the existing shared memory without tracking it by resource tracker of this process
+
+    The resource tracker removes the tracked shared memory at exit of process (bpo-39959), only the creator
+    of shared memory must remove it.
+    """
+    from multiprocessing import shared_memory
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name)
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+
+########################################################################################################################
+# The lazily decoded record
+########################################################################################################################
+class RecordView:
+    """ The copy of record data with items decoded on access (by attribute or by dotted name as key) """
+
+    __slots__ = ('_cls_', '_data_', '_seq_')
+
+    def __init__(self, cls: MetaStructure, data: bytes, seq: Optional[int] = None) -> None:
+        self._cls_ = cls
+        self._data_ = data
+        self._seq_ = seq
+
+    def __getitem__(self, name: str) -> Any:
+        offsets = self._cls_._offsets()
+        if name not in offsets:
+            raise KeyError(name)
+        start, length, decode, _ = offsets[name]
+        return decode(memoryview(self._data_)[start: start + length])
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return "RecordView({}, seq={})".format(self._cls_.__name__, self._seq_)
+
+    def __bytes__(self):
+        return bytes(self._data_)
+
+    def parse(self) -> DataStructure:
+        """ Return the record as object (the data exported by producer are not validated) """
+        return self._cls_._parse(self._data_, 0, None, True)[0]
+
+
+########################################################################################################################
+# The shared memory ring of records
+########################################################################################################################
+class RingBuffer:
+    """ The ring of fixed size records in shared memory (multiprocessing.shared_memory, Python 3.8+)
+
+    The producers export records into slots, the consumers read them by sequence numbers. The slots are stamped
+    by sequence number before and after writing, so the consumer detects the record overwritten while it's copied
+    (seqlock). More producers must share the lock, consumers never wait. Only the creator of ring removes the shared
+    memory, the attached rings only close it (they are not tracked by resource tracker).
+
+    Usage:
+        ring = RingBuffer(ImgHeader, 1024)                  # producer creates the ring
+        ring.put(header)
+        ring = RingBuffer(ImgHeader, name=name)             # consumer attaches it in other process
+        for view in ring.reader():
+            print(view.load_address)
+    """
+
+    __slots__ = ('cls', 'slots', 'size', 'lock', '_memory', '_stride', '_owner')
+
+    def __init__(self, cls: MetaStructure, slots: int = 0, name: Optional[str] = None, lock: Any = None) -> None:
+        """
+        :param cls: The DataStructure class with static size
+        :param slots: The count of slots of created ring, 0 for attaching existing ring
+        :param name: The name of shared memory, generated for created ring if None
+        :param lock: The lock shared by producers (e.g. multiprocessing.Lock), not needed for single producer
+        """
+        from multiprocessing import shared_memory
+
+        self.size = cls._static_size()
+        if self.size is None:
+            raise TypeError("Class '{}' has not static size".format(cls.__name__))
+
+        self.cls = cls
+        self.lock = lock
+        self._stride = (STAMP.size + self.size + 7) & ~7
+        # the process which created the ring (the forked processes don't remove it)
+        self._owner = os.getpid() if slots > 0 else None
+        if self._owner:
+            self._memory = shared_memory.SharedMemory(name, True, HEADER.size + slots * self._stride)
+            HEADER.pack_into(self._memory.buf, 0, 0, slots, self.size)
+            self.slots = slots
+        else:
+            if name is None:
+                raise ValueError("The name of shared memory is required for attaching the ring")
+            self._memory = attach_memory(name)
+            _, self.slots, size = HEADER.unpack_from(self._memory.buf)
+            if size != self.size:
+                self._memory.close()
+                raise ValueError("The ring records have size {}, the size of '{}' is {}".format(
+                    size, cls.__name__, self.size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __reduce__(self):
+        # the other process attaches the ring
+        return RingBuffer, (self.cls, 0, self.name, self.lock)
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    @property
+    def head(self) -> int:
+        """ The sequence number of next record """
+        return STAMP.unpack_from(self._memory.buf)[0]
+
+    def put(self, obj: DataStructure) -> int:
+        """ Export the object into next slot and return its sequence number """
+        if self.lock is None:
+            return self._put(obj)
+        with self.lock:
+            return self._put(obj)
+
+    def _put(self, obj: DataStructure) -> int:
+        buf = self._memory.buf
+        seq = STAMP.unpack_from(buf)[0]
+        offset = HEADER.size + (seq % self.slots) * self._stride
+        STAMP.pack_into(buf, offset, 2 * seq + 1)
+        start = offset + STAMP.size
+        if obj.export_into(buf[start: start + self.size]) != self.size:
+            raise ValueError("The object size doesn't match the record size {}".format(self.size))
+        STAMP.pack_into(buf, offset, 2 * seq + 2)
+        STAMP.pack_into(buf, 0, seq + 1)
+        return seq
+
+    def get(self, seq: int) -> Optional[RecordView]:
+        """ Return the record of sequence number or None if it's not written yet or it's already overwritten """
+        buf = self._memory.buf
+        offset = HEADER.size + (seq % self.slots) * self._stride
+        stamp = 2 * seq + 2
+        if STAMP.unpack_from(buf, offset)[0] != stamp:
+            return None
+        data = bytes(buf[offset + STAMP.size: offset + STAMP.size + self.size])
+        if STAMP.unpack_from(buf, offset)[0] != stamp:
+            return None
+        return RecordView(self.cls, data, seq)
+
+    def reader(self, seq: Optional[int] = None) -> 'RingReader':
+        """ Return the consumer of records from sequence number (from the next record if None) """
+        return RingReader(self, self.head if seq is None else seq)
+
+    def close(self) -> None:
+        """ Close the shared memory, the creator of ring also removes it """
+        self._memory.close()
+        if self._owner == os.getpid():
+            if os.name == 'posix' and sys.version_info < (3, 13):
+                # the ring attached by process with the same resource tracker removed it from tracked resources
+                from multiprocessing import resource_tracker
+                resource_tracker.register(self._memory._name, 'shared_memory')
+            self._memory.unlink()
+            self._owner = None
+
+
+class RingReader:
+    """ The consumer of ring records, the records overwritten before reading are counted as lost """
+
+    __slots__ = ('ring', 'seq', 'lost')
+
+    def __init__(self, ring: RingBuffer, seq: int) -> None:
+        self.ring = ring
+        self.seq = seq
+        self.lost = 0
+
+    def __len__(self):
+        """ The count of available records """
+        return min(self.ring.head - self.seq, self.ring.slots)
+
+    def __iter__(self) -> Iterator[RecordView]:
+        """ Iterate the available records """
+        while True:
+            view = self.get()
+            if view is None:
+                return
+            yield view
+
+    def get(self) -> Optional[RecordView]:
+        """ Return the next record or None if no record is available """
+        while True:
+            head = self.ring.head
+            if self.seq >= head:
+                return None
+            if head - self.seq > self.ring.slots:
+                self.lost += head - self.ring.slots - self.seq
+                self.seq = head - self.ring.slots
+            view = self.ring.get(self.seq)
+            self.seq += 1
+            if view is not None:
+                return view
+            self.lost += 1
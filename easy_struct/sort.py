@@ -0,0 +1,254 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import heapq
+import pickle
+import tempfile
+from struct import Struct as Codec
+from operator import itemgetter
+from typing import Optional, Any, Iterator
+from easy_struct.base_types import Int, Float
+from easy_struct.layout import INT_FORMATS, FLOAT_FORMATS, get_endian
+from easy_struct.file_data import FileData, CHUNK_SIZE
+
+# The count of records sorted in memory as one run
+RUN_RECORDS = 1024 * 1024
+# The count of (key, index) entries pickled at once into spilled run
+SPILL_ENTRIES = 64 * 1024
+
+
+########################################################################################################################
+# Helper functions
+########################################################################################################################
+def open_source(source: Any) -> Any:
+    return source if isinstance(source, (bytes, bytearray, memoryview, FileData)) else FileData(source)
+
+
+def close_source(source: Any, data: Any) -> None:
+    """ Close the FileData opened by open_source() """
+    if data is not source:
+        data.close()
+
+
+def get_count(data: Any, size: int) -> int:
+    count, rest = divmod(len(data), size)
+    if rest:
+        raise ValueError("Not enough data: {} bytes of last object at offset {}".format(rest, count * size))
+    return count
+
+
+def write_records(target: Any, records: Iterator) -> int:
+    """ Write raw records into file path or binary file object and return their count """
+    if isinstance(target, (str, bytes, os.PathLike)):
+        with open(target, 'wb') as f:
+            return write_records(f, records)
+
+    count = 0
+    buffer = bytearray()
+    for raw in records:
+        buffer += raw
+        count += 1
+        if len(buffer) >= CHUNK_SIZE:
+            target.write(buffer)
+            buffer.clear()
+    target.write(buffer)
+    return count
+
+
+def spill(entries: list, temp_dir: Optional[str]) -> Any:
+    """ Write sorted run of (key, index) entries into temporary file """
+    file = tempfile.TemporaryFile(dir=temp_dir)
+    for start in range(0, len(entries), SPILL_ENTRIES):
+        pickle.dump(entries[start: start + SPILL_ENTRIES], file, pickle.HIGHEST_PROTOCOL)
+    file.seek(0)
+    return file
+
+
+def load(file: Any) -> Iterator[tuple]:
+    """ Iterate (key, index) entries of spilled run """
+    while True:
+        try:
+            entries = pickle.load(file)
+        except EOFError:
+            return
+        yield from entries
+
+
+########################################################################################################################
+# The codec of key items
+########################################################################################################################
+class KeyCodec:
+    """ The codec unpacking only key items of records with static size
+
+    The key items are unpacked by single codec (struct.Struct) skipping the rest of record, the items without
+    native format are unpacked as raw bytes and decoded by their decode function.
+    """
+
+    __slots__ = ('size', 'codec', 'keys', 'direct')
+
+    def __init__(self, cls: Any, keys: list) -> None:
+        """
+        :param cls: The DataStructure class with static size
+        :param keys: The names of key items at static offset (dotted for items of nested structures)
+        """
+        self.size = cls._static_size()
+        if self.size is None:
+            raise TypeError("Class '{}' has not static size".format(cls.__name__))
+        if not keys:
+            raise ValueError("No key items")
+
+        offsets = cls._offsets()
+        for name in keys:
+            if name not in offsets:
+                raise ValueError("The key item '{}' of class '{}' is not at static offset".format(name, cls.__name__))
+
+        endian = get_endian({name: offsets[name][3] for name in keys})
+        fmt = {'little': '<', 'big': '>'}[endian]
+        spans = {}
+        position = 0
+        for name in sorted(set(keys), key=lambda key: offsets[key][0]):
+            start, length, _, metadata = offsets[name]
+            if (start, length) in spans:
+                continue
+            if start < position:
+                raise ValueError("The key item '{}' overlaps other key item".format(name))
+            if start > position:
+                fmt += '{}x'.format(start - position)
+            if isinstance(metadata, Int) and length in INT_FORMATS and (length == 1 or metadata.endian == endian):
+                fmt += INT_FORMATS[length] if metadata.signed else INT_FORMATS[length].upper()
+                native = True
+            elif isinstance(metadata, Float) and metadata.endian == endian:
+                fmt += FLOAT_FORMATS[length]
+                native = True
+            else:
+                fmt += '{}s'.format(length)
+                native = False
+            spans[(start, length)] = (len(spans), native)
+            position = start + length
+        if self.size > position:
+            fmt += '{}x'.format(self.size - position)
+
+        self.codec = Codec(fmt)
+        self.keys = []
+        for name in keys:
+            start, length, decode, _ = offsets[name]
+            index, native = spans[(start, length)]
+            self.keys.append((index, None if native else decode))
+        # the unpacked rows are the keys
+        self.direct = self.keys == [(index, None) for index in range(len(spans))]
+
+    def unpack(self, data: Any, count: int, offset: int = 0) -> list:
+        """ Return the keys of count records as list of tuples """
+        view = memoryview(data)[offset: offset + count * self.size]
+        if len(view) < count * self.size:
+            raise ValueError("Not enough data for {} records of size {}".format(count, self.size))
+        rows = self.codec.iter_unpack(view)
+        if self.direct:
+            return list(rows)
+        keys = self.keys
+        return [tuple(row[index] if decode is None else decode(row[index]) for index, decode in keys) for row in rows]
+
+
+########################################################################################################################
+# The external sort and merge of records
+########################################################################################################################
+def sort_records(cls: Any, source: Any, target: Any, keys: list, reverse: bool = False,
+                 run_records: int = RUN_RECORDS, temp_dir: Optional[str] = None) -> int:
+    """ Sort records with static size by key items (the sort is stable)
+
+    Only keys of records are decoded. The runs of (key, index) entries are sorted in memory and spilled into
+    temporary files, then they are merged and the raw records are copied from source into target.
+
+    :param cls: The DataStructure class with static size
+    :param source: The data, file path or binary file object with records
+    :param target: The file path or binary file object for sorted records (must not be the source file)
+    :param keys: The names of key items (dotted for items of nested structures)
+    :param reverse: Sort in descending order
+    :param run_records: The count of records sorted in memory
+    :param temp_dir: The directory of spilled runs, the default temporary directory if None
+    :return: The count of records
+    """
+    codec = KeyCodec(cls, keys)
+    data = open_source(source)
+    runs = []
+    try:
+        if isinstance(data, FileData) and isinstance(target, (str, bytes, os.PathLike)) and \
+           os.path.exists(target) and os.path.samefile(target, data.fileno()):
+            raise ValueError("The records can't be sorted in place")
+
+        size = codec.size
+        count = get_count(data, size)
+        first = itemgetter(0)
+        for start in range(0, count, run_records):
+            length = min(run_records, count - start)
+            chunk = data[start * size: (start + length) * size] if isinstance(data, FileData) else data
+            offset = 0 if isinstance(data, FileData) else start * size
+            run = list(zip(codec.unpack(chunk, length, offset), range(start, start + length)))
+            run.sort(key=first, reverse=reverse)
+            runs.append(run if count <= run_records else spill(run, temp_dir))
+            # the next run is sorted without the previous one in memory
+            del run, chunk
+
+        if len(runs) == 1:
+            entries = runs[0]
+        else:
+            entries = heapq.merge(*(load(run) for run in runs), key=first, reverse=reverse)
+
+        if isinstance(data, FileData):
+            records = (data.read(index * size, size) for _, index in entries)
+        else:
+            view = memoryview(data)
+            records = (view[index * size: (index + 1) * size] for _, index in entries)
+        return write_records(target, records)
+    finally:
+        for run in runs:
+            if not isinstance(run, list):
+                run.close()
+        close_source(source, data)
+
+
+def merge_records(cls: Any, sources: list, target: Any, keys: list, reverse: bool = False) -> int:
+    """ Merge sorted sources of records with static size into target (the records with equal keys keep
+    the order of sources)
+
+    :param cls: The DataStructure class with static size
+    :param sources: The data, file paths or binary file objects with records sorted by keys
+    :param target: The file path or binary file object for merged records
+    :param keys: The names of key items (dotted for items of nested structures)
+    :param reverse: The sources are sorted in descending order
+    :return: The count of records
+    """
+    codec = KeyCodec(cls, keys)
+    size = codec.size
+    chunk_records = max(CHUNK_SIZE // size, 1)
+
+    def records(data):
+        count = get_count(data, size)
+        for start in range(0, count, chunk_records):
+            length = min(chunk_records, count - start)
+            chunk = memoryview(data[start * size: (start + length) * size])
+            for index, key in enumerate(codec.unpack(chunk, length)):
+                yield key, chunk[index * size: (index + 1) * size]
+
+    opened = []
+    try:
+        for source in sources:
+            opened.append((source, open_source(source)))
+        entries = heapq.merge(*(records(data) for _, data in opened), key=itemgetter(0), reverse=reverse)
+        return write_records(target, (raw for _, raw in entries))
+    finally:
+        for source, data in opened:
+            close_source(source, data)
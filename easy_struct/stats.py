@@ -0,0 +1,243 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import Counter
+from typing import Optional, Any, Iterable
+from easy_enum import Enum
+from easy_struct.base_types import IntBits, Int, Float, String
+from easy_struct.file_data import FileData
+
+# The count of records with static layout decoded in one pass
+CHUNK_RECORDS = 64 * 1024
+
+
+########################################################################################################################
+# The summary of one item
+########################################################################################################################
+class ItemSummary:
+    """ The count, min, max, sum and histogram of item values
+
+    The histogram of item with choices counts the values, otherwise it counts the values in bins of the same width
+    between min_value and max_value of item (or explicit bounds).
+    """
+
+    __slots__ = ('metadata', 'count', 'min', 'max', 'total', 'histogram', 'low', 'width')
+
+    def __init__(self, metadata: Any, bins: int = 16, bounds: Optional[tuple] = None) -> None:
+        self.metadata = metadata
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0
+        self.histogram = Counter()
+        self.low = None
+        self.width = None
+
+        if metadata.choices is None:
+            low, high = bounds if bounds is not None else (getattr(metadata, 'min_value', None),
+                                                           getattr(metadata, 'max_value', None))
+            if low is not None and high is not None:
+                self.low = low
+                if isinstance(metadata, Float):
+                    self.width = (high - low) / bins
+                else:
+                    self.width = -(-(high - low + 1) // bins)
+
+    @property
+    def numeric(self) -> bool:
+        return not isinstance(self.metadata, String)
+
+    def update(self, values: Iterable) -> None:
+        """ Add the column of values """
+        values = values if isinstance(values, (list, tuple)) else list(values)
+        if not values:
+            return
+
+        self.count += len(values)
+        if self.numeric:
+            low, high = min(values), max(values)
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+            self.total += sum(values)
+
+        if self.metadata.choices is not None:
+            self.histogram.update(values)
+        elif self.width:
+            start, width = self.low, self.width
+            if isinstance(width, float):
+                self.histogram.update(int((value - start) // width) for value in values)
+            else:
+                self.histogram.update((value - start) // width for value in values)
+
+    def merge(self, other: 'ItemSummary') -> None:
+        if (self.low, self.width) != (other.low, other.width):
+            raise ValueError("The histograms with different bins can't be merged")
+
+        self.count += other.count
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.total += other.total
+        self.histogram.update(other.histogram)
+
+    def result(self) -> dict:
+        result = {'count': self.count}
+        if self.numeric:
+            result['min'] = self.min
+            result['max'] = self.max
+            result['mean'] = self.total / self.count if self.count else None
+
+        choices = self.metadata.choices
+        if isinstance(choices, type) and issubclass(choices, Enum):
+            result['histogram'] = {(choices[value] if value in choices else value): count
+                                   for value, count in sorted(self.histogram.items())}
+        elif choices is not None:
+            result['histogram'] = dict(sorted(self.histogram.items()))
+        elif self.width:
+            result['histogram'] = [(self.low + index * self.width, self.low + (index + 1) * self.width, count)
+                                   for index, count in sorted(self.histogram.items())]
+        return result
+
+
+########################################################################################################################
+# The summary of DataStructure items
+########################################################################################################################
+class Summary:
+    """ The streaming summary of item values of objects stored one after another
+
+    The objects with static layout are decoded by columns in chunks, the summarized items of others are decoded
+    one by one without parsing the whole objects.
+    The partial summaries (e.g. of file parts processed by parallel workers) are joined by merge() method.
+
+    Usage:
+        summary = Summary(ImgHeader, ['data_size', 'os_type']).update(data)
+        print(summary.result()['os_type']['histogram'])
+    """
+
+    __slots__ = ('cls', 'items')
+
+    def __init__(self, cls: Any, fields: Optional[list] = None, bins: int = 16,
+                 bounds: Optional[dict] = None) -> None:
+        """
+        :param cls: The DataStructure class
+        :param fields: The names of summarized items, all integer and float items and items with choices if None
+        :param bins: The count of histogram bins of items without choices
+        :param bounds: The histogram range as (low, high) by item name, the range of item values if not specified
+        """
+        annotations = cls.__annotations__
+        if fields is None:
+            fields = [name for name, metadata in annotations.items()
+                      if isinstance(metadata, (Int, IntBits, Float)) or
+                      (isinstance(metadata, String) and metadata.choices is not None)]
+
+        self.cls = cls
+        self.items = {}
+        for name in fields:
+            metadata = annotations.get(name)
+            if not isinstance(metadata, (Int, IntBits, Float, String)):
+                raise ValueError("The item '{}' of class '{}' can't be summarized".format(name, cls.__name__))
+            self.items[name] = ItemSummary(metadata, bins, (bounds or {}).get(name))
+
+    def update(self, data: Any, offset: int = 0, count: Optional[int] = None) -> 'Summary':
+        """ Add values of objects stored in data
+
+        :param data: The data, file path or binary file object
+        :param offset: The offset of first object
+        :param count: The count of objects, all objects until the end of data if None
+        """
+        if not isinstance(data, (bytes, bytearray, memoryview, FileData)):
+            with FileData(data) as data:
+                return self.update(data, offset, count)
+
+        layout = self.cls._get_layout()
+        if layout is None:
+            self.update_items(data, offset, count)
+            return self
+
+        if count is None:
+            count, rest = divmod(len(data) - offset, layout.size)
+            if rest:
+                raise ValueError("Not enough data: {} bytes of last object at offset {}".format(
+                    rest, offset + count * layout.size))
+
+        while count > 0:
+            chunk = min(count, CHUNK_RECORDS)
+            if isinstance(data, FileData):
+                self.add_columns(layout.columns(data[offset: offset + chunk * layout.size], chunk))
+            else:
+                self.add_columns(layout.columns(data, chunk, offset))
+            offset += chunk * layout.size
+            count -= chunk
+        return self
+
+    def update_items(self, data: Any, offset: int, count: Optional[int]) -> None:
+        """ Add values of objects without static layout, the items are decoded like in DataStructure.select() """
+        cls = self.cls
+        view = data if isinstance(data, FileData) else memoryview(data)
+        offsets = cls._offsets()
+        static_size = cls._static_size()
+        columns = {name: [] for name in self.items}
+        records = 0
+
+        while (offset < len(data)) if count is None else count > 0:
+            if static_size is None:
+                size, values = cls._measure(data, offset)
+                if size is None:
+                    raise ValueError("Not enough data for object at offset {}".format(offset))
+            else:
+                size, values = static_size, {}
+            if offset + size > len(data):
+                raise ValueError("Not enough data: {} bytes at offset {} required".format(size, offset))
+
+            obj = None
+            for name, column in columns.items():
+                if name in offsets:
+                    start, length, decode, _ = offsets[name]
+                    column.append(decode(view[offset + start: offset + start + length]))
+                elif name in values:
+                    column.append(values[name])
+                else:
+                    # the item at dynamic offset which isn't measured, the whole object must be parsed
+                    if obj is None:
+                        obj = cls.parse(data, offset)
+                    column.append(getattr(obj, name))
+
+            offset += size
+            records += 1
+            if count is not None:
+                count -= 1
+            if records == CHUNK_RECORDS:
+                self.add_columns(columns)
+                columns = {name: [] for name in self.items}
+                records = 0
+
+        self.add_columns(columns)
+
+    def add_columns(self, columns: dict) -> None:
+        """ Add values from dict of value lists by item name (e.g. returned by DataStructure.parse_columns()) """
+        for name, item in self.items.items():
+            item.update(columns[name])
+
+    def merge(self, other: 'Summary') -> 'Summary':
+        """ Add the values of other summary of the same class and items """
+        if other.cls is not self.cls or other.items.keys() != self.items.keys():
+            raise ValueError("The summaries of different classes or items can't be merged")
+
+        for name, item in self.items.items():
+            item.merge(other.items[name])
+        return self
+
+    def result(self) -> dict:
+        """ Return the summary as dict by item name: {'count', 'min', 'max', 'mean', 'histogram'} """
+        return {name: item.result() for name, item in self.items.items()}
@@ -13,11 +13,10 @@
 # limitations under the License.
 
 from os import path
-from zlib import crc32
 from typing import Union, Any
 from datetime import datetime
 from easy_enum import Enum
-from easy_struct import DataStructure, Int8u, Int32u, String, Bytes, Struct, prefix
+from easy_struct import DataStructure, Int8u, Int32u, String, Bytes, Compressed, Struct, prefix, crc32
 
 
 ########################################################################################################################
@@ -151,7 +150,7 @@ class ImgHeader(DataStructure, endian='little'):
 
     # private (hidden) attributes
     _magic_number: Int32u(default=0x27051956, choices=[0x27051956], pfmt='X')
-    _header_crc:   Int32u(pfmt='X')
+    _header_crc:   Int32u(pfmt='X', crc_of=('_magic_number', 'image_name'))
     _timestamp:    Int32u(pfmt=timestamp_print)
 
     # public attributes
@@ -174,15 +173,8 @@ class ImgHeader(DataStructure, endian='little'):
         assert isinstance(value, (int, datetime))
         self._timestamp = value if isinstance(value, int) else int(value.timestamp())
 
-    def update(self):
-        self._header_crc = 0
-        self._header_crc = crc32(self.export(update=False))
-
     def validate(self):
-        pars_crc = self._header_crc
-        self._header_crc = 0
-        calc_crc = crc32(self.export(update=False))
-        if pars_crc != calc_crc:
+        if self.computed()['_header_crc'] != self._header_crc:
             raise Exception("Invalid Header CRC")
 
 
@@ -210,12 +202,12 @@ class UImage(DataStructure, endian='little'):
 
     # Image Header
     _magic_number: Int32u(default=0x27051956, choices=[0x27051956], pfmt='X')  # hidden private attribute as constant
-    _header_crc:   Int32u(pfmt='X')                                            # hidden private attribute
+    _header_crc:   Int32u(pfmt='X', crc_of=('_magic_number', 'image_name'))    # hidden private attribute
     _timestamp:    Int32u(pfmt=timestamp_print)                                # hidden attribute with public interface
-    data_size:     Int32u(pfmt='Z')                                            # public attribute
+    data_size:     Int32u(pfmt='Z', size_of='image_data')                      # public attribute
     load_address:  Int32u(pfmt='X')
     entry_address: Int32u(pfmt='X')
-    data_crc:      Int32u(pfmt='X', desc="The CRC of data section")
+    data_crc:      Int32u(pfmt='X', desc="The CRC of data section", crc_of='image_data')
     os_type:       Int8u(default=EnumOsType.LINUX, choices=EnumOsType)
     arch_type:     Int8u(default=EnumArchType.ARM, choices=EnumArchType)
     image_type:    Int8u(default=EnumImageType.FIRMWARE, choices=EnumImageType)
@@ -223,7 +215,7 @@ class UImage(DataStructure, endian='little'):
     image_name:    String(length=32, default="U-Boot Executable Image")
 
     # Image Data (the length is specified in header)
-    image_data:    Bytes(length='data_size')
+    image_data:    Compressed(length='data_size', tag='compression')
 
     @property
     def timestamp(self) -> datetime:
@@ -234,20 +226,15 @@ class UImage(DataStructure, endian='little'):
         assert isinstance(value, (int, datetime))
         self._timestamp = value if isinstance(value, int) else int(value.timestamp())
 
-    def update(self):
-        self.data_crc = crc32(self.image_data)
-        self.data_size = len(self.image_data)
-        self._header_crc = 0
-        self._header_crc = crc32(self.export(update=False, ignore=['image_data']))
-
     def validate(self):
-        pars_crc = self._header_crc
-        self._header_crc = 0
-        calc_crc = crc32(self.export(update=False, ignore=['image_data']))
-        if pars_crc != calc_crc:
+        # the CRC and size items are calculated without reading of image data into memory
+        computed = self.computed()
+        if computed['_header_crc'] != self._header_crc:
             raise Exception("Invalid Header CRC")
-        if self.data_crc != crc32(self.image_data):
+        if computed['data_crc'] != self.data_crc:
             raise Exception("Invalid Data CRC")
+        if computed['data_size'] != self.data_size:
+            raise Exception("Invalid Data Size")
 
 
 ########################################################################################################################
@@ -42,6 +42,9 @@ setup(
     install_requires=[
         'easy_enum==0.3.0'
     ],
+    extras_require={
+        'arrow': ['pyarrow']
+    },
     classifiers=[
         'Operating System :: OS Independent',
         'Programming Language :: Python :: 3',
@@ -0,0 +1,24 @@
+import os
+import zlib
+from easy_struct import FileBytes, crc32
+from easy_struct import checksum
+
+
+def test_crc32_combine():
+    data1 = os.urandom(1000)
+    data2 = os.urandom(777)
+    assert checksum.crc32_combine(zlib.crc32(data1), zlib.crc32(data2), len(data2)) == zlib.crc32(data1 + data2)
+    assert checksum.crc32_combine(zlib.crc32(data1), 0, 0) == zlib.crc32(data1)
+
+
+def test_parallel_crc32(tmp_path, monkeypatch):
+    monkeypatch.setattr(checksum, 'PARALLEL_THRESHOLD', 1024)
+    monkeypatch.setattr(checksum, 'PARALLEL_CHUNK_SIZE', 1000)
+    data = os.urandom(100 * 1024 + 13)
+    assert crc32(data, workers=4) == zlib.crc32(data)
+    assert crc32(bytearray(data), 0x1234, workers=4) == zlib.crc32(data, 0x1234)
+    # file backed data
+    file = str(tmp_path / 'data.bin')
+    with open(file, 'wb') as f:
+        f.write(data)
+    assert crc32(FileBytes(file, 13), workers=4) == zlib.crc32(data[13:])
@@ -0,0 +1,62 @@
+import pytest
+from easy_enum import Enum
+from easy_struct import *
+
+pa = pytest.importorskip('pyarrow')
+
+
+class OsType(Enum):
+    LINUX = (5, "linux", "Linux")
+    QNX = (7, "qnx", "QNX")
+
+
+class Point(DataStructure):
+    x: Int16sl
+    y: Int16sl
+
+
+class Record(DataStructure):
+    magic: Int32ub(default=0x27051956, desc="Magic number")
+    os_type: Int8u(default=OsType.LINUX, choices=OsType)
+    size: Int24ul
+    ratio: Float64l(default=0.0)
+    name: String(length=8)
+    data: Bytes(length=4)
+    values: Array(itype=Int8s, length=3)
+    point: Struct(Point)
+
+
+def test_arrow_schema():
+    schema = arrow_schema(Record)
+
+    assert schema.names == ['magic', 'os_type', 'size', 'ratio', 'name', 'data', 'values', 'point']
+    assert schema.field('magic').type == pa.uint32()
+    assert schema.field('magic').metadata == {b'description': b'Magic number'}
+    assert schema.field('os_type').type == pa.dictionary(pa.int32(), pa.string())
+    assert schema.field('size').type == pa.uint32()
+    assert schema.field('ratio').type == pa.float64()
+    assert schema.field('name').type == pa.string()
+    assert schema.field('data').type == pa.binary(4)
+    assert schema.field('values').type == pa.list_(pa.int8(), 3)
+    assert schema.field('point').type == pa.struct([pa.field('x', pa.int16(), False), pa.field('y', pa.int16(), False)])
+
+
+def test_arrow_conversion():
+    objs = [Record(os_type=OsType.QNX if i % 2 else OsType.LINUX, size=i * 1000, ratio=i / 4, name='rec{}'.format(i),
+                   data=bytes([i] * 4), values=[i, -i, 0], point=Point(x=-i, y=i)) for i in range(10)]
+    data = b''.join(obj.export() for obj in objs)
+
+    batch = to_arrow(Record, data)
+    assert batch.num_rows == 10
+    assert batch.schema == arrow_schema(Record)
+    assert batch.column('os_type').to_pylist()[:2] == ['linux', 'qnx']
+    assert batch.column('data').to_pylist()[3] == bytes([3] * 4)
+    assert batch.column('point').to_pylist()[3] == {'x': -3, 'y': 3}
+    assert to_arrow(Record, data, 2, Record._static_size()).column('size').to_pylist() == [1000, 2000]
+
+    assert from_arrow(Record, batch) == data
+    assert from_arrow(Record, pa.Table.from_batches([batch, batch])) == data * 2
+    with pytest.raises(ValueError):
+        to_arrow(Record, data[:-1])
+    with pytest.raises(TypeError):
+        to_arrow(DataStructure, data)
@@ -0,0 +1,69 @@
+import os
+import sys
+import types
+import pytest
+from easy_struct import *
+
+pytest.importorskip('jinja2')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from gen_codec import generate
+
+
+class Point(DataStructure):
+    x: Int16sl
+    y: Int16sl
+
+
+class Sample(DataStructure):
+    magic:    Int32ub(default=0x5A5A, choices=[0x5A5A])
+    flags:    IntBits(bits=3, default=5)
+    level:    IntBits(bits=12, offset=3, signed=True, default=-7)
+    counter:  Int24ul(default=0x123456, offset=1)
+    gain:     Float32l(default=1.5)
+    name:     String(length=8, default="sample", choices=["sample", "other"])
+    values:   Array(itype=Int16ul, length=3, default=[1, 2, 3])
+    crc:      Int32ul(crc_of=('magic', 'points'))
+    size:     Int16ul(size_of='data')
+    count:    Int8u(count_of='points')
+    data:     Bytes(length='size')
+    points:   Array(itype=Point, length='count')
+    origin:   Struct(Point)
+
+
+def load_codec(classes):
+    module = types.ModuleType('codec')
+    exec(compile(generate(classes), 'codec', 'exec'), module.__dict__)
+    return module
+
+
+def test_generated_codec():
+    codec = load_codec([Sample])
+    assert codec.CODECS[Point] == (codec.parse_Point, codec.export_Point, codec.raw_size_Point)
+
+    obj = Sample(data=b'payload', points=[Point(x=1, y=-1), Point(x=-300, y=300)])
+    raw = obj.export()
+    assert codec.export_Sample(obj) == raw
+    assert codec.parse_Sample(raw) == Sample.parse(raw)
+    assert codec.parse_Sample(raw).level == -7
+    assert codec.raw_size_Sample(obj) == obj.raw_size() == len(raw)
+
+    # the computed items are updated in object
+    obj.data = b'new data'
+    raw = codec.export_Sample(obj)
+    assert obj.size == 8
+    assert raw == obj.export()
+
+    # the inlined checks
+    with pytest.raises(ValueError):
+        codec.parse_Sample(raw[:20])
+    with pytest.raises(ValueError):
+        codec.parse_Sample(b'\xff' + raw[1:])
+
+
+def test_unsupported_class():
+    class Message(DataStructure):
+        kind: Int8u
+        body: Union('kind', {0: Point})
+
+    with pytest.raises(TypeError):
+        generate([Message])
@@ -1,4 +1,5 @@
 
+import io
 import pytest
 from easy_enum import Enum
 from easy_struct import *
@@ -56,3 +57,827 @@ def test_data_structure():
 
     data = ds.export()
     assert len(data) == 136
+
+
+def test_default_prototype():
+    ds1 = DSClassic()
+    ds2 = DSClassic()
+    assert ds1 == ds2
+    # mutable values are not shared between objects
+    assert ds1.data is not ds2.data
+    assert ds1.items is not ds2.items
+    # unmodified object returns cached binary image
+    assert ds1.export() is ds2.export()
+    assert ds1.export() == DSClassic(signature=0x155729).export()
+    # modification in place invalidates the cached image
+    ds1.data[0] = 0
+    assert ds1.export() != ds2.export()
+    assert ds1.export()[11] == 0
+    ds2.image_size = 10
+    assert ds2.export() == DSClassic(image_size=10).export()
+
+
+class DSFrozen(DataStructure, frozen=True):
+    """ Example of immutable DataStructure """
+
+    signature: Int32ul(default=0x155729, pfmt='X')
+    data:      Bytes(length=4)
+    items:     Array(itype=Int16ul, length=2)
+
+
+def test_frozen():
+    ds1 = DSFrozen(data=b'1234', items=[1, 2])
+    ds2 = DSFrozen.parse(ds1.export())
+    assert isinstance(ds1.data, bytes)
+    assert isinstance(ds1.items, tuple)
+    assert ds1 == ds2
+    assert hash(ds1) == hash(ds2)
+    assert len({ds1, ds2, DSFrozen()}) == 2
+    with pytest.raises(AttributeError):
+        ds1.signature = 0
+    with pytest.raises(TypeError):
+        hash(DSClassic())
+
+
+def test_parse_cached():
+    DSClassic.parse_cache().clear()
+    data = DSClassic(image_size=10).export()
+    ds1 = DSClassic.parse_cached(data)
+    ds2 = DSClassic.parse_cached(data)
+    assert ds1 == ds2
+    assert ds1 is not ds2
+    assert ds1.data is not ds2.data
+    assert DSClassic.parse_cache().info()['hits'] == 1
+    assert DSClassic.parse_cache().info()['misses'] == 1
+    # frozen objects are returned directly from cache
+    data = DSFrozen(data=b'1234').export()
+    assert DSFrozen.parse_cached(data) is DSFrozen.parse_cached(data)
+    # least recently used object is evicted
+    cache = DSFrozen.parse_cache()
+    cache.maxsize = 1
+    DSFrozen.parse_cached(DSFrozen().export())
+    assert len(cache) == 1
+    assert cache.info()['evictions'] == 1
+    # the same object inside different streams hits the cache
+    data = Chunk(data=b'abcd').export()
+    Chunk.parse_cache().clear()
+    assert Chunk.parse_cached(data + b'tail').data == Chunk.parse_cached(b'head' + data, 4).data == b'abcd'
+    assert Chunk.parse_cache().info()['hits'] == 1
+
+
+class MsgHeader(DataStructure):
+    image_type: Int8u(default=ImageType.KERNEL, choices=ImageType)
+
+
+class MsgKernel(DataStructure):
+    load_address: Int32ul(default=0x80000, pfmt='X')
+
+
+class MsgScript(DataStructure):
+    script: String(length=8, default='boot')
+
+
+class Message(DataStructure):
+    """ Example of DataStructure with union item """
+
+    header: Struct(MsgHeader)
+    body:   Union(tag='header.image_type', cases={ImageType.KERNEL: MsgKernel, ImageType.SCRIPT: MsgScript})
+
+
+def test_union():
+    msg = Message()
+    assert isinstance(msg.body, MsgKernel)
+    assert msg.raw_size() == 5
+    assert msg.info()
+    stream = msg.export()
+    msg.header.image_type = ImageType.SCRIPT
+    with pytest.raises(ValueError):
+        msg.export()
+    msg.body = MsgScript()
+    stream += msg.export()
+    assert len(stream) == 14
+    msg1 = Message.parse(stream)
+    msg2 = Message.parse(stream, msg1.raw_size())
+    assert msg1.body.load_address == 0x80000
+    assert msg2.body.script == 'boot'
+    # unknown tag value
+    with pytest.raises(ValueError):
+        Message.parse(b'\x01\x00\x00\x00\x00')
+
+
+def test_union_without_default_case():
+    class Packet(DataStructure):
+        kind: Int8u
+        body: Union('kind', {1: MsgKernel, 6: MsgScript})
+
+    packet = Packet()
+    assert packet.body is None
+    assert Packet._static_size() is None
+    assert 'body: None' in packet.info()
+    with pytest.raises(ValueError):
+        packet.export()
+    packet.kind = 6
+    packet.body = MsgScript()
+    assert Packet.parse(packet.export()) == packet
+
+    # the tag must be reachable through Struct items
+    with pytest.raises(TypeError):
+        class Invalid(DataStructure):
+            kind: Int8u
+            body: Union('kind.type', {1: MsgKernel})
+
+
+class Partition(DataStructure):
+    """ Example of partition entry """
+
+    part_type: Int8u(default=ImageType.KERNEL, choices=ImageType)
+    name:      String(length=7, default='boot')
+    start:     Int32ul
+    size:      Int32ul(pfmt='Z')
+
+
+class PartitionTable(DataStructure):
+    """ Example of DataStructure with array of structures """
+
+    count:      Int8u(default=2)
+    partitions: Array(itype=Partition, length='count')
+
+
+def test_struct_array():
+    table = PartitionTable(partitions=[Partition(start=0, size=10), Partition(name='rootfs', start=10, size=100)])
+    assert table.raw_size() == 33
+    assert table.info()
+    data = table.export()
+    parsed = PartitionTable.parse(data)
+    assert parsed == table
+    assert parsed.partitions[1].name == 'rootfs'
+    # batched decoding of static layout
+    objs = Partition.parse_array(data, 2, 1)
+    assert objs == table.partitions
+    columns = Partition.parse_columns(data, 2, 1)
+    assert columns['start'] == [0, 10]
+    assert columns['name'] == ['boot', 'rootfs']
+    with pytest.raises(ValueError):
+        Partition.parse_array(b'\x02' + bytes(15), 2)
+    # the array with dependent length is empty by default
+    assert PartitionTable(count=0).partitions == []
+
+
+class Chunk(DataStructure):
+    """ Example of DataStructure with computed item """
+
+    size: Int32ul(size_of='data')
+    data: Bytes(length='size')
+
+
+class Blob(DataStructure):
+    """ Example of DataStructure with length updated by update() method """
+
+    size: Int32ul
+    data: Bytes(length='size')
+
+    def update(self):
+        self.size = len(self.data)
+
+
+def test_pickle(monkeypatch):
+    import copy
+    import pickle
+
+    table = PartitionTable(partitions=[Partition(start=0, size=10), Partition(name='rootfs', start=10, size=100)])
+    for obj in (DSClassic(image_size=10), DSFrozen(data=b'1234'), Message(), table):
+        clone = pickle.loads(pickle.dumps(obj))
+        assert clone == obj and clone is not obj
+        assert clone.export() == obj.export()
+
+    # the unpickled objects are not validated
+    monkeypatch.setattr(Partition, 'validate', lambda self: pytest.fail("validated"))
+    batch = Partition.batch(table.partitions * 50)
+    data = pickle.dumps(batch)
+    assert len(data) < 100 * Partition().raw_size() + 200
+    clone = pickle.loads(data)
+    assert isinstance(clone, list) and clone == batch and clone.cls is Partition
+    assert pickle.loads(pickle.dumps(PartitionTable.batch([table, PartitionTable(count=0)]))) == \
+        [table, PartitionTable(count=0)]
+    assert pickle.loads(pickle.dumps(table)).partitions[1].name == 'rootfs'
+
+    # the computed items of pickled or copied object are not changed and file data are not read by copy
+    chunk = Chunk(data=b'abcd')
+    assert copy.copy(chunk).size == 0 and copy.deepcopy(chunk).data == b'abcd'
+    assert pickle.loads(pickle.dumps(chunk)).data == b'abcd'
+    assert pickle.loads(pickle.dumps(Chunk.batch([chunk, chunk])))[1].data == b'abcd'
+    assert chunk.size == 0
+    with open(__file__, 'rb') as f:
+        chunk.data = FileBytes(f)
+        assert not copy.copy(chunk).data.materialized
+
+    # the image of unpickled or copied object isn't used after in place modification of its data
+    obj = DSClassic(data=b'x' * 100)
+    for clone in (pickle.loads(pickle.dumps(obj)), copy.copy(obj)):
+        clone.data[:] = DSClassic().data
+        assert clone.export() == DSClassic().export()
+
+    # the objects with not updated lengths are pickled by values
+    for obj in (Blob(data=b'abc' * 100), PartitionTable(), Message()):
+        clone = pickle.loads(pickle.dumps(obj))
+        assert clone == obj and clone.__dict__ == obj.__dict__
+    blob = Blob(data=b'abc' * 100)
+    assert pickle.loads(pickle.dumps(Blob.batch([Blob(), blob]))) == [Blob(), blob]
+    assert blob.size == 0
+
+
+def test_decoder():
+    tables = [PartitionTable(count=i, partitions=[Partition(start=n) for n in range(i)]) for i in range(4)]
+    stream = b''.join(table.export() for table in tables)
+    decoder = Decoder(PartitionTable)
+    objs = []
+    for i in range(0, len(stream), 5):
+        objs += list(decoder.feed(stream[i: i + 5]))
+    assert objs == tables
+    assert len(decoder) == 0
+    # the size is known after header arrives
+    decoder.feed(tables[3].export()[:1])
+    assert decoder.required == 49
+    with pytest.raises(ValueError):
+        PartitionTable.parse(tables[3].export()[:20])
+
+
+def test_tolerant_decoder():
+    class Record(DataStructure):
+        magic: Int32ub(default=0x27051956, choices=[0x27051956])
+        size:  Int16ul(size_of='data')
+        crc:   Int32ul(crc_of='data')
+        data:  Bytes(length='size')
+
+        def validate(self):
+            crc = self.crc
+            self.export(update=False)
+            if crc != self.crc:
+                raise Exception("Invalid CRC")
+
+    records = [Record(data=bytes([i]) * (i + 1)) for i in range(4)]
+    raw = [rec.export() for rec in records]
+    corrupted = raw[1][:-1] + b'\xff'
+    stream = raw[0] + b'garbage' + corrupted + raw[2] + b'\x27\x05' + raw[3]
+
+    errors = []
+    decoder = Decoder(Record, tolerant=True, on_error=lambda offset, e: errors.append((offset, str(e))))
+    objs = []
+    for i in range(0, len(stream), 3):
+        objs += list(decoder.feed(stream[i: i + 3]))
+    assert objs == [records[0], records[2], records[3]]
+    assert errors == [(len(raw[0]) + 7, "Invalid CRC")]
+    assert decoder.failures == 1 and decoder.records == 3
+    assert decoder.skipped == 7 + len(corrupted) + 2
+    assert decoder.offset == len(stream)
+
+    # the objects with too big size are skipped
+    decoder = Decoder(Record, tolerant=True, max_size=12)
+    assert list(decoder.feed(b''.join(raw))) == records[:2]
+    assert [offset for offset, _ in decoder.errors] == [len(raw[0]) + len(raw[1]), len(b''.join(raw[:3]))]
+    # the parsing error is raised in default mode
+    with pytest.raises(Exception):
+        list(Decoder(Record).feed(corrupted))
+    # the decoder stays at object with too big size until reset
+    decoder = Decoder(Record, max_size=12)
+    assert list(decoder.feed(b''.join(raw[:2]))) == records[:2]
+    with pytest.raises(ValueError):
+        list(decoder.feed(raw[2]))
+    with pytest.raises(ValueError):
+        list(decoder.feed(raw[0]))
+    assert decoder.offset == len(raw[0]) + len(raw[1])
+    decoder.reset()
+    assert list(decoder.feed(raw[0])) == records[:1]
+
+
+def test_compressed(tmp_path, monkeypatch):
+    import zlib
+    from easy_struct import compression
+
+    class Image(DataStructure):
+        compression: Int8u(default=1)
+        size:        Int32ul(size_of='data')
+        crc:         Int32ul(crc_of='data')
+        data:        Compressed(length='size', tag='compression')
+
+    payload = bytes(range(256)) * 1024
+    img = Image(data=CompressedData(data=payload))
+    raw = img.export()
+    assert img.size == len(raw) - 9 < len(payload)
+    assert img.crc == crc32(raw[9:])
+    assert zlib.decompress(raw[9:], 16 + zlib.MAX_WBITS) == payload
+
+    # the parsed data are decompressed on demand in chunks and exported without recompression
+    (tmp_path / 'image.bin').write_bytes(raw)
+    img = Image.parse_file(str(tmp_path / 'image.bin'), min_size=16)
+    assert isinstance(img.data, CompressedData) and not img.data.modified
+    assert img.data.crc32() == crc32(payload)
+    assert img.data.find(bytes(range(250, 256)) + bytes(range(4))) == 250
+    assert img.data.size() == len(payload)
+    monkeypatch.setitem(compression.CODECS, 'gzip', (compression.gzip_decompressor, None))
+    assert img.export() == raw
+    monkeypatch.undo()
+
+    # the modified data or method are compressed again
+    img.data.data = payload[:1000]
+    assert Image.parse(img.export()).data.data == payload[:1000]
+    for method in (2, 3, 0):
+        img.compression = method
+        raw = img.export()
+        assert Image.parse(raw).data.data == payload[:1000]
+    assert raw[9:] == payload[:1000]
+    with pytest.raises(ValueError):
+        Image(compression=4, data=CompressedData(data=b'data')).export()
+
+    # the equal data have equal hash
+    lzma_data = CompressedData(data=b'data').compressed('lzma')
+    for first, second in ((CompressedData(lzma_data, 'lzma'), b'data'),
+                          (CompressedData(data=b'data'), CompressedData(lzma_data, 'lzma')),
+                          (CompressedData(b'raw'), b'raw')):
+        assert first == second and hash(first) == hash(second)
+    # the data without compression method can't be decompressed
+    assert CompressedData().data == b''
+    with pytest.raises(ValueError):
+        CompressedData(b'raw').data
+
+
+def produce(ring, count):
+    for i in range(count):
+        ring.put(Partition(name='p{}'.format(i), start=i))
+    ring.close()
+
+
+def test_ring_buffer():
+    import multiprocessing
+
+    buffer = bytearray(20)
+    assert Partition(start=5).export_into(buffer, 2) == 16
+    assert buffer[2:18] == Partition(start=5).export()
+    with pytest.raises(ValueError):
+        Partition().export_into(buffer, 10)
+
+    # the shared memory requires Python 3.8+
+    pytest.importorskip('multiprocessing.shared_memory')
+    with pytest.raises(TypeError):
+        RingBuffer(PartitionTable, 4)
+
+    with RingBuffer(Partition, 4) as ring:
+        consumer = RingBuffer(Partition, name=ring.name)
+        reader = consumer.reader()
+        assert reader.get() is None
+        for i in range(3):
+            ring.put(Partition(name='p{}'.format(i), start=i))
+        views = list(reader)
+        assert [view.name for view in views] == ['p0', 'p1', 'p2']
+        assert views[1]['start'] == 1 and views[1].parse() == Partition(name='p1', start=1)
+        # the records overwritten before reading are lost
+        for i in range(3, 10):
+            ring.put(Partition(name='p{}'.format(i), start=i))
+        assert len(reader) == 4
+        assert [view.start for view in reader] == [6, 7, 8, 9]
+        assert reader.lost == 3
+
+        # the records from other process
+        if 'fork' in multiprocessing.get_all_start_methods():
+            reader = consumer.reader()
+            process = multiprocessing.get_context('fork').Process(target=produce, args=(ring, 3))
+            process.start()
+            process.join()
+            assert [view.start for view in reader] == [0, 1, 2]
+        consumer.close()
+
+        # the ring attached by unrelated process isn't removed at its exit
+        import os
+        import sys
+        import subprocess
+        import easy_struct
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(easy_struct.__file__)))
+        code = "from easy_struct.ring import attach_memory; attach_memory('{}').close()".format(ring.name)
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+        RingBuffer(Partition, name=ring.name).close()
+
+
+def test_export_iov(tmp_path):
+    class Image(DataStructure):
+        size: Int32ul
+        data: Bytes(length='size')
+
+    img = Image(size=4096, data=bytes(range(256)) * 16)
+    segments = img.export_iov()
+    assert len(segments) == 2
+    assert isinstance(segments[1], memoryview)
+    assert b''.join(segments) == img.export()
+    # write into file
+    with open(str(tmp_path / 'image.bin'), 'wb') as f:
+        assert img.write_to(f) == 4100
+    with open(str(tmp_path / 'image.bin'), 'rb') as f:
+        assert Image.parse(f.read()) == img
+    # write into socket
+    import socket
+    sock1, sock2 = socket.socketpair()
+    with sock1, sock2:
+        assert img.write_to(sock1) == 4100
+        data = b''
+        while len(data) < 4100:
+            data += sock2.recv(8192)
+    assert data == img.export()
+
+
+def test_file_bytes(tmp_path):
+    class Image(DataStructure):
+        load_address: Int32ul
+        size:         Int32ul
+        crc:          Int32ul
+        data:         Bytes(length='size')
+
+        def update(self):
+            self.size = len(self.data)
+            self.crc = crc32(self.data)
+
+    src_file = str(tmp_path / 'src.bin')
+    dst_file = str(tmp_path / 'dst.bin')
+    with open(src_file, 'wb') as f:
+        f.write(Image(data=bytes(range(256)) * 1024).export())
+
+    img = Image.parse_file(src_file, min_size=1024)
+    assert isinstance(img.data, FileBytes)
+    assert not img.data.materialized
+    assert img.crc == crc32(img.data)
+    assert img.data[256:260] == b'\x00\x01\x02\x03'
+    assert img.info()
+    # re-header without reading payload
+    img.load_address = 0x80000
+    with open(dst_file, 'wb') as f:
+        assert img.write_to(f) == 12 + 256 * 1024
+    assert not img.data.materialized
+    with open(dst_file, 'rb') as f:
+        assert Image.parse(f.read()) == img
+    # modification reads the payload into memory
+    img.data[0] = 0xFF
+    assert img.data.materialized
+    assert img.export()[12] == 0xFF
+
+    # the file opened from path is closed, unless the parsed object refers its data
+    assert not img.data.source.file.closed
+    img.data.source.close()
+    assert img.data.source.file.closed
+    with FileData(src_file) as data:
+        assert Image.parse(data, 0).size == 256 * 1024
+    assert data.file.closed
+    with open(src_file, 'rb') as f:
+        FileData(f).close()
+        assert not f.closed
+
+
+def test_computed_items():
+    class Packet(DataStructure):
+        magic:       Int32ul(default=0xCAFE)
+        header_crc:  Int32ul(crc_of=('magic', 'data_crc'))
+        data_offset: Int16ul(offset_of='data')
+        data_size:   Int16ul(size_of='data')
+        item_count:  Int8u(count_of='items')
+        items:       Array(itype=Int16ul, length='item_count')
+        data_crc:    Int32ul(crc_of='data')
+        data:        Bytes(length='data_size')
+
+    pkt = Packet(items=[1, 2, 3], data=b'payload')
+    raw = pkt.export()
+    assert pkt.data_offset == 23
+    assert pkt.data_size == 7
+    assert pkt.item_count == 3
+    assert pkt.data_crc == crc32(b'payload')
+    # the header CRC covers the data CRC calculated in the same pass (itself is counted as zero)
+    assert pkt.header_crc == crc32(raw[0:4] + bytes(4) + raw[8:23])
+    assert Packet.parse(raw) == pkt
+    # the computed items are refreshed after modification
+    pkt.data = b'new payload'
+    assert pkt.computed()['data_size'] == 11 and pkt.data_size == 7
+    raw = pkt.export()
+    assert pkt.data_size == 11
+    assert pkt.data_crc == crc32(b'new payload')
+    assert pkt.header_crc == crc32(raw[0:4] + bytes(4) + raw[8:23])
+
+    # the referenced items are checked at class creation
+    with pytest.raises(TypeError):
+        class BitsSize(DataStructure):
+            flags: IntBits(bits=8)
+            size:  Int8u(size_of='flags')
+    with pytest.raises(TypeError):
+        class IntCount(DataStructure):
+            value: Int8u
+            count: Int8u(count_of='value')
+    with pytest.raises(TypeError):
+        class FrozenSize(DataStructure, frozen=True):
+            size: Int8u(size_of='data')
+            data: Bytes(length=4)
+
+
+def test_item_instances():
+    class First(DataStructure):
+        value: Int16ul
+        other: Int32u
+
+    class Second(DataStructure, endian='big'):
+        value: Int16ul
+        other: Int32u
+
+    class Third(DataStructure):
+        value: Int16ul
+        other: Int8u
+
+    # every item type without parameters gets its own instance
+    assert First.__annotations__['value'] is not Third.__annotations__['value']
+    First.__annotations__['value'].description = 'first value'
+    assert Third.__annotations__['value'].description != 'first value'
+    assert Second(other=1).export() == b'\x00\x00\x00\x00\x00\x01'
+    assert First(other=1).export() == b'\x00\x00\x01\x00\x00\x00'
+
+
+def test_plan_cache(tmp_path, monkeypatch):
+    import sys
+    import importlib.util
+    from easy_struct import cache
+    from easy_struct.layout import Layout
+
+    def load_module(source):
+        (tmp_path / 'records.py').write_text("from easy_struct import *\n\n" + source)
+        for file in tmp_path.glob('__pycache__/*.pyc'):
+            file.unlink()
+        spec = importlib.util.spec_from_file_location('records', str(tmp_path / 'records.py'))
+        module = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, 'records', module)
+        spec.loader.exec_module(module)
+        cache.PLAN_CACHES.pop('records', None)
+        return module
+
+    monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+    monkeypatch.setattr(cache, 'PLAN_CACHE_ENABLED', True)
+    source = "class Record(DataStructure):\n    size: Int16ul\n    crc: Int32ul(crc_of='name')\n    name: String(8)\n"
+    record = load_module(source).Record
+    assert record.fingerprint() == load_module(source).Record.fingerprint()
+    assert record.fingerprint() != load_module(source.replace('Int16ul', 'Int16ub')).Record.fingerprint()
+    # the Enums with the same name and other members differ
+    enum = "class Kind(Enum):\n    A = (1, 'a', '')\n\n"
+    source_enum = "from easy_enum import Enum\n" + enum + source.replace('Int16ul', 'Int16ul(choices=Kind, default=1)')
+    other_enum = source_enum.replace("(1, 'a', '')", "(2, 'a', '')").replace('default=1', 'default=2')
+    assert load_module(source_enum).Record.fingerprint() != load_module(other_enum).Record.fingerprint()
+
+    # the plan is compiled and stored on disk
+    record = load_module(source).Record
+    layout = record._get_layout()
+    raw = record(name='test').export()
+    cache.save_plans()
+    assert (tmp_path / '__pycache__' / 'records.plans-{}.json'.format(cache.PLAN_VERSION)).exists()
+
+    # the plan is loaded from disk
+    monkeypatch.setattr(Layout, 'build', None)
+    record = load_module(source).Record
+    assert record._get_layout().plan() == layout.plan()
+    assert record().crc == crc32(b'\0' * 8)
+    assert record(name='test').export() == raw
+    assert record.parse_array(raw, 1)[0].name == 'test'
+
+    # the plan of modified class is compiled again
+    monkeypatch.undo()
+    monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+    monkeypatch.setattr(cache, 'PLAN_CACHE_ENABLED', True)
+    record = load_module(source.replace('String(8)', 'String(4)')).Record
+    assert record._get_layout().size == 10
+    assert record().crc == crc32(b'\0' * 4)
+
+
+def test_metrics(monkeypatch):
+    class Point(DataStructure):
+        x: Int16ul
+        y: Int16ul(choices=[0, 1, 2])
+
+    class Shape(DataStructure):
+        kind:   IntBits(bits=4, default=1)
+        flags:  IntBits(bits=4, offset=4)
+        count:  Int8u(count_of='points')
+        points: Array(itype=Point, length='count')
+
+    shape = Shape(points=[Point(x=1), Point(x=2, y=1)])
+    records = []
+    metrics = Metrics(callback=records.append).attach(Point, Shape)
+    try:
+        raw = shape.export()
+        shape = Shape.parse(raw)
+        assert shape.info()
+        with pytest.raises(ValueError):
+            Point.parse(b'\x00\x00\x05\x00')
+    finally:
+        metrics.detach(Point, Shape)
+
+    stats = metrics.snapshot()
+    assert stats['Shape']['exported'] == 1 and stats['Shape']['exported_bytes'] == len(raw) == 10
+    assert stats['Shape']['parsed'] == 1 and stats['Shape']['parsed_bytes'] == 10
+    assert stats['Shape']['items']['count']['parsed_bytes'] == 1
+    assert stats['Shape']['items']['kind']['parsed_bits'] == 4 and stats['Shape']['items']['kind']['parsed_bytes'] == 0
+    assert stats['Shape']['items']['flags']['exported_bits'] == 4
+    assert stats['Shape']['items']['points']['exported_bytes'] == 8
+    assert stats['Shape']['compute_time'] > 0 and stats['Shape']['info_time'] > 0
+    assert stats['Point']['parsed'] == 2 and stats['Point']['errors'] == 1
+    assert stats['Point']['validation_failures'] == 1
+    assert stats['Point']['items']['y']['validation_failures'] == 1
+    assert records[-1]['class'] == 'Point' and records[-1]['error']
+    assert [r['operation'] for r in records if r['class'] == 'Shape'] == ['export', 'parse']
+
+    # the detached classes are not measured
+    Shape.parse(raw)
+    assert metrics.snapshot() == stats
+    assert Shape._monitor_ is None
+
+    # the items of monitored objects are validated once
+    calls = []
+    point = Point(x=1, y=2)
+    validate = Int.validate
+    monkeypatch.setattr(Int, 'validate', lambda self, value: calls.append(value) or validate(self, value))
+    assert Point.parse(b'\x01\x00\x02\x00') == point and calls == [1, 2]
+    calls.clear()
+    Metrics().attach(Point)
+    try:
+        assert Point.parse(b'\x01\x00\x02\x00') == point and calls == [1, 2]
+    finally:
+        Point._monitor_ = None
+
+
+def test_tracer(tmp_path):
+    import json
+
+    class Header(DataStructure):
+        magic: Int32ub(default=0x27051956)
+        size:  Int32ub
+
+    class Image(DataStructure):
+        header: Struct(Header)
+        data:   Bytes(length='header.size')
+
+    raw = Image(header=Header(size=4), data=b'\x01\x02\x03\x04').export()
+    tracer = Tracer().attach(DataStructure)
+    try:
+        Image.parse(raw)
+    finally:
+        tracer.detach(DataStructure)
+    assert DataStructure._monitor_ is None
+
+    tracer.save(str(tmp_path / 'trace.json'))
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    spans = {(e['cat'], e['name']): e for e in events}
+    assert spans[('parse', 'Image')]['args'] == {'class': 'Image', 'offset': 0, 'length': 12}
+    assert spans[('parse', 'Header')]['args']['length'] == 8
+    assert spans[('parse.item', 'Image.data')]['args'] == {'class': 'Image', 'field': 'data', 'offset': 8,
+                                                          'length': 4}
+    # the nested structure is inside of its item span which is inside of the parent span
+    outer, item, inner = spans[('parse', 'Image')], spans[('parse.item', 'Image.header')], spans[('parse', 'Header')]
+    end = lambda span: span['ts'] + span['dur'] + 0.001
+    assert outer['ts'] <= item['ts'] <= inner['ts']
+    assert end(inner) <= end(item) <= end(outer)
+
+
+def test_select(tmp_path):
+    class Header(DataStructure):
+        magic:      Int32ub(default=0x27051956)
+        image_type: Int8u(choices=ImageType, default=ImageType.KERNEL)
+        flags:      IntBits(bits=4)
+        level:      IntBits(bits=4, offset=4)
+        data_size:  Int32ub
+        load_addr:  Int32ub
+
+    class Image(DataStructure):
+        header: Struct(Header)
+        data:   Bytes(length='header.data_size')
+        name:   String(length=8)
+
+    images = [Image(header=Header(image_type=ImageType.RAMDISK, data_size=4, level=1), data=b'\0' * 4, name='a'),
+              Image(header=Header(data_size=2, load_addr=0x100, level=2), data=b'\1\2', name='b'),
+              Image(header=Header(data_size=8, load_addr=0x200, level=3), data=b'\3' * 8, name='c')]
+    raw = b''.join(img.export() for img in images)
+
+    # the static header is decoded at precomputed offsets only
+    headers = b''.join(img.header.export() for img in images)
+    assert list(Header.select(headers, where={'image_type': ImageType.KERNEL}, fields=['load_addr', 'level'])) == \
+        [{'load_addr': 0x100, 'level': 2}, {'load_addr': 0x200, 'level': 3}]
+    assert list(Header.select(headers, where={'level': 1})) == [images[0].header]
+
+    # the objects with dynamic size are measured
+    where = {'header.image_type': ImageType.KERNEL, 'header.data_size': lambda size: size > 4}
+    assert list(Image.select(raw, where=where, fields=['header.load_addr', 'name'])) == \
+        [{'header.load_addr': 0x200, 'name': 'c'}]
+    (tmp_path / 'images.bin').write_bytes(raw)
+    assert list(Image.select(str(tmp_path / 'images.bin'), where={'name': 'b'})) == [images[1]]
+    with pytest.raises(ValueError):
+        list(Image.select(raw[:-1]))
+
+
+def test_summary(tmp_path, monkeypatch):
+    class Record(DataStructure):
+        kind:  Int8u(choices=ImageType, default=ImageType.KERNEL)
+        size:  Int16ul
+        gain:  Float32l(default=0.0)
+        name:  String(length=4, choices=['a', 'b'], default='a')
+
+    records = [Record(kind=ImageType.RAMDISK, size=100, gain=0.5),
+               Record(size=300, gain=1.5, name='b'),
+               Record(size=65535, gain=-1.0)]
+    raw = b''.join(rec.export() for rec in records)
+
+    result = Record.summary(raw, bins=4).result()
+    assert result['size']['count'] == 3
+    assert (result['size']['min'], result['size']['max'], result['size']['mean']) == (100, 65535, 21978.333333333332)
+    assert result['size']['histogram'] == [(0, 16384, 2), (49152, 65536, 1)]
+    assert result['kind']['histogram'] == {'kernel': 2, 'ramdisk': 1}
+    assert result['name']['histogram'] == {'a': 2, 'b': 1}
+    assert result['gain']['mean'] == 1 / 3 and 'histogram' not in result['gain']
+
+    # the summaries of data parts are merged
+    (tmp_path / 'records.bin').write_bytes(raw)
+    first = Record.summary(raw[:11], ['size', 'kind'], bins=4)
+    second = Summary(Record, ['size', 'kind'], bins=4).update(str(tmp_path / 'records.bin'), offset=11)
+    merged = first.merge(second).result()
+    assert merged['size'] == result['size'] and merged['kind'] == result['kind']
+    with pytest.raises(ValueError):
+        first.merge(Record.summary(raw, ['size'], bins=4))
+
+    # the objects with dynamic size are parsed one by one
+    class Message(DataStructure):
+        level: IntBits(bits=4)
+        flags: IntBits(bits=4, offset=4)
+        size:  Int8u(size_of='data')
+        data:  Bytes(length='size')
+        tail:  Int8u
+
+    raw = Message(level=15, data=b'ab', tail=7).export() + Message(level=1, data=b'abcd', tail=9).export()
+    result = Message.summary(raw, bins=4).result()
+    assert result['size']['min'] == 2 and result['size']['max'] == 4
+    assert result['level']['histogram'] == [(0, 4, 1), (12, 16, 1)]
+    assert result['tail']['mean'] == 8
+
+    # the columns are added in chunks
+    monkeypatch.setattr('easy_struct.stats.CHUNK_RECORDS', 1)
+    assert Message.summary(raw, bins=4).result() == result
+
+
+def test_sort_file(tmp_path):
+    class Point(DataStructure):
+        x: Int8u
+        y: Int8u
+
+    class Record(DataStructure):
+        stamp: Int32ub
+        point: Struct(Point)
+        name:  String(length=4)
+
+    records = [Record(stamp=(i * 7) % 10, point=Point(x=i % 3, y=i), name='r{}'.format(i)) for i in range(30)]
+    raw = b''.join(rec.export() for rec in records)
+    (tmp_path / 'records.bin').write_bytes(raw)
+
+    # the runs of 4 records are spilled into temporary files
+    assert Record.sort_file(str(tmp_path / 'records.bin'), str(tmp_path / 'sorted.bin'), ['stamp', 'point.y'],
+                            run_records=4, temp_dir=str(tmp_path)) == 30
+    result = Record.parse_array((tmp_path / 'sorted.bin').read_bytes(), 30)
+    assert result == sorted(records, key=lambda rec: (rec.stamp, rec.point.y))
+
+    # the sort is stable
+    target = io.BytesIO()
+    Record.sort_file(raw, target, ['point.x'], reverse=True)
+    result = Record.parse_array(target.getvalue(), 30)
+    assert result == sorted(records, key=lambda rec: rec.point.x, reverse=True)
+
+    # the sorted files are merged
+    first, second = io.BytesIO(), io.BytesIO()
+    Record.sort_file(raw[:10 * 9], first, ['name'])
+    Record.sort_file(raw[10 * 9:], second, ['name'])
+    target = io.BytesIO()
+    assert Record.merge_files([first.getvalue(), second.getvalue()], target, ['name']) == 30
+    assert Record.parse_array(target.getvalue(), 30) == sorted(records, key=lambda rec: rec.name)
+
+    with pytest.raises(ValueError):
+        Record.sort_file(raw, target, ['point', 'point.y'])
+    with pytest.raises(ValueError):
+        Record.sort_file(str(tmp_path / 'records.bin'), str(tmp_path / 'records.bin'), ['stamp'])
+
+
+def test_bit_array():
+    class Frame(DataStructure):
+        count:   Int8u(count_of='samples')
+        samples: Array(itype=IntBits(bits=12, signed=True), length='count')
+        flags:   Array(itype=IntBits(bits=3, endian='big'), length=3)
+
+    frame = Frame(samples=[0, 1, -1, 2047, -2048], flags=[1, 2, 7])
+    data = frame.export()
+    assert len(data) == 1 + 8 + 2
+    assert data[1:4] == b'\x00\x10\x00' and data[9:] == b'\x2b\x80'
+
+    parsed = Frame.parse(data)
+    assert parsed.samples == [0, 1, -1, 2047, -2048]
+    assert parsed.flags == [1, 2, 7]
+    assert parsed == frame
+
+    # the records with static layout
+    class Sample(DataStructure):
+        values: Array(itype=IntBits(bits=12), length=4)
+
+    data = b''.join(Sample(values=[i, 4095 - i, 0, i * 3]).export() for i in range(10))
+    assert Sample._static_size() == 6
+    assert [obj.values for obj in Sample.parse_array(data, 10)] == [[i, 4095 - i, 0, i * 3] for i in range(10)]
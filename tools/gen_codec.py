@@ -0,0 +1,515 @@
+# Copyright 2020 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Generate the module with parse/export/raw_size functions specialized for DataStructure classes
+
+Usage: python gen_codec.py <module> <output_file> [class_name ...]
+
+All offsets, struct formats, bitfield masks and value checks are inlined into straight-line code,
+so the metadata of items is not introspected at import or call time.
+"""
+
+import os
+import re
+import sys
+import argparse
+import importlib
+from jinja2 import Template
+from easy_struct.base_class import DataStructure, Struct, Union
+from easy_struct.base_types import IntBits, Int, Float, String, Bytes, Array, Compressed
+from easy_struct.layout import INT_FORMATS, FLOAT_FORMATS
+
+template_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "codec.j2")
+
+
+########################################################################################################################
+# Helper functions
+########################################################################################################################
+def at(base: str, offset: int) -> str:
+    return base if offset == 0 else "{} + {}".format(base, offset)
+
+
+def is_native(mdata) -> bool:
+    return isinstance(mdata, Float) or (isinstance(mdata, Int) and mdata.size in INT_FORMATS)
+
+
+def get_code(mdata) -> str:
+    if isinstance(mdata, Float):
+        return FLOAT_FORMATS[mdata.size]
+    code = INT_FORMATS[mdata.size]
+    return code if mdata.signed else code.upper()
+
+
+def get_range(mdata) -> tuple:
+    bits = mdata.bits if isinstance(mdata, IntBits) else mdata.bytes * 8
+    if mdata.signed:
+        return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    return 0, (1 << bits) - 1
+
+
+def fmt_set(values) -> str:
+    return "{" + ", ".join(repr(v) for v in values) + "}" if values else "()"
+
+
+def get_checks(var: str, mdata, where: str) -> list:
+    """ Return the lines of inlined validation of value stored in variable """
+    if isinstance(mdata, (Int, IntBits)):
+        if mdata.choices is not None:
+            choices = [item[1] for item in mdata.choices] if isinstance(mdata.choices, type) else mdata.choices
+            cond = "{} not in {}".format(var, fmt_set(choices))
+        elif (mdata.min_value, mdata.max_value) != get_range(mdata):
+            cond = "not {} <= {} <= {}".format(mdata.min_value, var, mdata.max_value)
+        else:
+            return []
+    elif isinstance(mdata, Float):
+        if mdata.choices is not None:
+            cond = "{} not in {}".format(var, fmt_set(mdata.choices))
+        else:
+            conds = []
+            if mdata.min_value is not None:
+                conds.append("{} < {!r}".format(var, mdata.min_value))
+            if mdata.max_value is not None:
+                conds.append("{} > {!r}".format(var, mdata.max_value))
+            if not conds:
+                return []
+            cond = " or ".join(conds)
+    elif isinstance(mdata, String) and mdata.choices is not None:
+        cond = "{} not in {}".format(var, fmt_set(mdata.choices))
+    else:
+        return []
+
+    return ["if {}:".format(cond),
+            "    raise ValueError(\"Invalid value of '{}': {{!r}}\".format({}))".format(where, var)]
+
+
+def get_element(name: str, mdata) -> dict:
+    """ Return the description of item unpacked by struct codec or None if the item has not static size """
+    elem = {'kind': 'value', 'names': [name], 'pad': mdata.offset, 'count': 1, 'endian': None}
+    if is_native(mdata):
+        elem.update(fmt=get_code(mdata), size=mdata.size, endian=mdata.endian if mdata.size > 1 else None)
+    elif isinstance(mdata, (Int, String)) or (isinstance(mdata, Bytes) and isinstance(mdata.length, int)):
+        elem.update(fmt="{}s".format(mdata.size), size=mdata.size)
+    elif isinstance(mdata, Array) and isinstance(mdata.length, int) and is_native(mdata.item_type):
+        itype = mdata.item_type
+        elem.update(kind='array', fmt="{}{}".format(mdata.length, get_code(itype)), count=mdata.length,
+                    size=mdata.length * itype.size, endian=itype.endian if itype.size > 1 else None)
+    else:
+        return None
+    return elem
+
+
+def get_steps(cls) -> list:
+    """ Split items into runs of static items unpacked by one codec and the items with dynamic size """
+    items = cls.__annotations__
+    names = tuple(items.keys())
+    steps = []
+    run = None
+    index = 0
+
+    while index < len(names):
+        name = names[index]
+        mdata = items[name]
+
+        if isinstance(mdata, IntBits):
+            group = []
+            while index < len(names) and isinstance(items[names[index]], IntBits):
+                group.append(names[index])
+                index += 1
+            bits = max(items[n].offset + items[n].bits for n in group)
+            size = (bits // 8) + 1 if bits % 8 else bits // 8
+            elem = {'kind': 'bits', 'names': group, 'pad': 0, 'count': 1, 'endian': None,
+                    'fmt': "{}s".format(size), 'size': size}
+        else:
+            index += 1
+            if isinstance(mdata, (Union, Compressed)):
+                raise TypeError("Item '{}' of class '{}': {} is not supported".format(
+                    name, cls.__name__, type(mdata).__name__))
+            if isinstance(mdata, Array) and isinstance(mdata.item_type, IntBits):
+                raise TypeError("Item '{}' of class '{}': Array of IntBits is not supported".format(
+                    name, cls.__name__))
+            elem = get_element(name, mdata)
+            if elem is None:
+                steps.append({'kind': 'dynamic', 'name': name, 'pad': mdata.offset})
+                run = None
+                continue
+
+        if run is None or (elem['endian'] and run['endian'] and elem['endian'] != run['endian']):
+            run = {'kind': 'run', 'elements': [], 'endian': None, 'size': 0}
+            steps.append(run)
+        run['endian'] = run['endian'] or elem['endian']
+        run['size'] += elem['pad']
+        elem['offset'] = run['size']
+        run['size'] += elem['size']
+        run['elements'].append(elem)
+
+    for step in steps:
+        if step['kind'] == 'run':
+            step['fmt'] = {'little': '<', 'big': '>'}[step['endian'] or 'little'] + ''.join(
+                ("{}x".format(e['pad']) if e['pad'] else '') + e['fmt'] for e in step['elements'])
+
+    return steps
+
+
+def get_crc_order(cls, names: list) -> list:
+    """ Return the CRC items ordered so that CRC covering other CRC item is calculated after it """
+    items = cls.__annotations__
+    index = {name: i for i, name in enumerate(items.keys())}
+    pending = list(names)
+    order = []
+    while pending:
+        for name in pending:
+            _, first, last = items[name].compute
+            if not any(index[first] <= index[other] <= index[last] for other in pending if other != name):
+                break
+        else:
+            raise ValueError("Cyclic CRC items in class '{}'".format(cls.__name__))
+        pending.remove(name)
+        order.append(name)
+    return order
+
+
+########################################################################################################################
+# The code generator of one DataStructure class
+########################################################################################################################
+class ClassCodec:
+
+    def __init__(self, cls) -> None:
+        self.cls = cls
+        self.name = cls.__name__
+        self.items = cls.__annotations__
+        self.frozen = cls._frozen_
+        self.depends = []
+        self.formats = []
+        self.parse = []
+        self.export = []
+        self.raw_size = []
+
+        steps = get_steps(cls)
+        self._gen_parse(steps)
+        self._gen_export(steps)
+        self._gen_raw_size(steps)
+
+    def _where(self, name: str) -> str:
+        return "{}.{}".format(self.name, name)
+
+    def _struct(self, struct) -> str:
+        if struct not in self.depends:
+            self.depends.append(struct)
+        return struct.__name__
+
+    def _ref(self, path: str, parsed: list) -> str:
+        keys = path.split('.')
+        if keys[0] not in parsed:
+            raise KeyError("Class '{}' refers to unknown item '{}'".format(self.name, path))
+        return "v_{}".format(keys[0]) + ''.join(".{}".format(key) for key in keys[1:])
+
+    def _item_checks(self, var: str, name: str, itype) -> list:
+        checks = get_checks("item", itype, self._where(name))
+        return ["for item in {}:".format(var)] + ["    " + line for line in checks] if checks else []
+
+    def _gen_parse(self, steps: list) -> None:
+        lines = self.parse
+        base, pos = 'offset', 0
+        parsed = []
+
+        for index, step in enumerate(steps):
+            if step['kind'] == 'run':
+                codec = step['codec'] = "_{}_{}".format(self.name, len(self.formats))
+                self.formats.append((codec, step['fmt']))
+                lines += ["if len(data) < {}:".format(at(base, pos + step['size'])),
+                          "    raise _not_enough({}, {})".format(at(base, pos), step['size']),
+                          "t = {}.unpack_from(data, {})".format(codec, at(base, pos))]
+                value = 0
+                for elem in step['elements']:
+                    lines += self._parse_element(elem, value)
+                    parsed += elem['names']
+                    value += elem['count']
+                pos += step['size']
+                continue
+
+            name = step['name']
+            mdata = self.items[name]
+            var = "v_{}".format(name)
+            start = at(base, pos + step['pad'])
+            end = "p{}".format(index)
+
+            if isinstance(mdata, Struct):
+                lines.append("{}, {} = _parse_{}(data, {})".format(var, end, self._struct(mdata.struct), start))
+            elif isinstance(mdata, Bytes):
+                lines += ["{} = {} + {}".format(end, start, self._ref(mdata.length, parsed)),
+                          "{} = {}(data[{}: {}])".format(var, 'bytes' if self.frozen else 'bytearray', start, end)]
+            else:
+                itype = mdata.item_type
+                length = mdata.length if isinstance(mdata.length, int) else self._ref(mdata.length, parsed)
+                if Array.is_struct(itype):
+                    lines += ["{} = []".format(var),
+                              "{} = {}".format(end, start),
+                              "for _ in range({}):".format(length),
+                              "    item, {} = _parse_{}(data, {})".format(end, self._struct(itype), end),
+                              "    {}.append(item)".format(var)]
+                else:
+                    lines += ["{} = {} + {} * {}".format(end, start, length, itype.size),
+                              "if len(data) < {}:".format(end),
+                              "    raise _not_enough({}, {} - ({}))".format(start, end, start)]
+                    if is_native(itype):
+                        fmt = {'little': '<', 'big': '>'}[itype.endian] + '%d' + get_code(itype)
+                        lines.append("{} = list(unpack_from('{}' % {}, data, {}))".format(var, fmt, length, start))
+                    elif isinstance(itype, Int):
+                        lines.append("{} = [int.from_bytes(data[p: p + {}], '{}', signed={}) "
+                                     "for p in range({}, {}, {})]".format(var, itype.size, itype.endian, itype.signed,
+                                                                         start, end, itype.size))
+                    else:
+                        lines.append("{} = [data[p: p + {}].decode('{}').strip('\\0').strip() "
+                                     "for p in range({}, {}, {})]".format(var, itype.size, itype.encoding,
+                                                                         start, end, itype.size))
+                    lines += self._item_checks(var, name, itype)
+                if self.frozen:
+                    lines.append("{} = tuple({})".format(var, var))
+
+            parsed.append(name)
+            base, pos = end, 0
+
+        end = at(base, pos)
+        if any(step['kind'] == 'dynamic' for step in steps):
+            lines += ["if len(data) < {}:".format(end),
+                      "    raise _not_enough(offset, {} - offset)".format(end)]
+        lines += ["obj = {}.__new__({})".format(self.name, self.name),
+                  "obj.__dict__.update({"]
+        lines += ["    '{}': v_{},".format(name, name) for name in self.items]
+        lines += ["})",
+                  "_set(obj, '_image_', None)",
+                  "_set(obj, '_hash_', None)"]
+        if self.cls.validate is not DataStructure.validate:
+            lines.append("obj.validate()")
+        lines.append("return obj, {}".format(end))
+
+    def _parse_element(self, elem: dict, index: int) -> list:
+        if elem['kind'] == 'bits':
+            lines = ["raw = int.from_bytes(t[{}], 'little')".format(index)]
+            for name in elem['names']:
+                mdata = self.items[name]
+                value = "raw >> {} & {}".format(mdata.offset, hex((1 << mdata.bits) - 1)) if mdata.offset else \
+                        "raw & {}".format(hex((1 << mdata.bits) - 1))
+                if mdata.signed:
+                    sign = hex(1 << (mdata.bits - 1))
+                    value = "(({}) ^ {}) - {}".format(value, sign, sign)
+                lines.append("v_{} = {}".format(name, value))
+                lines += get_checks("v_{}".format(name), mdata, self._where(name))
+            return lines
+
+        name = elem['names'][0]
+        mdata = self.items[name]
+        var = "v_{}".format(name)
+        if elem['kind'] == 'array':
+            container = 'tuple' if self.frozen else 'list'
+            return ["{} = {}(t[{}: {}])".format(var, container, index, index + elem['count'])] + \
+                   self._item_checks(var, name, mdata.item_type)
+        if is_native(mdata):
+            value = "t[{}]".format(index)
+        elif isinstance(mdata, Int):
+            value = "int.from_bytes(t[{}], '{}', signed={})".format(index, mdata.endian, mdata.signed)
+        elif isinstance(mdata, String):
+            value = "t[{}].decode('{}').strip('\\0').strip()".format(index, mdata.encoding)
+        else:
+            value = "t[{}]".format(index) if self.frozen else "bytearray(t[{}])".format(index)
+        return ["{} = {}".format(var, value)] + get_checks(var, mdata, self._where(name))
+
+    def _gen_export(self, steps: list) -> None:
+        lines = self.export
+        base, pos = 'start', 0
+        positions = {}
+        computed = self.cls._computed_
+
+        if self.cls.update is not DataStructure.update:
+            lines += ["if update:",
+                      "    obj.update()"]
+        lines += ["values = obj.__dict__",
+                  "start = len(buf)"]
+
+        for index, step in enumerate(steps):
+            if step['kind'] == 'run':
+                lines.append("buf += {}.pack(".format(step['codec']))
+                for elem in step['elements']:
+                    lines.append("    {},".format(self._export_element(elem, computed)))
+                    for name in elem['names']:
+                        item_pos = pos + elem['offset']
+                        positions[name] = (at(base, item_pos), at(base, item_pos + elem['size']))
+                lines.append(")")
+                pos += step['size']
+                continue
+
+            name = step['name']
+            mdata = self.items[name]
+            value = "values['{}']".format(name)
+            end = "p{}".format(index)
+            if step['pad']:
+                lines.append("buf += bytes({})".format(step['pad']))
+
+            if isinstance(mdata, Struct):
+                lines.append("_export_{}({}, buf, update)".format(self._struct(mdata.struct), value))
+            elif isinstance(mdata, Bytes):
+                lines.append("buf += _bytes({})".format(value))
+            else:
+                itype = mdata.item_type
+                if Array.is_struct(itype):
+                    lines += ["for item in {}:".format(value),
+                              "    _export_{}(item, buf, update)".format(self._struct(itype))]
+                elif is_native(itype):
+                    fmt = {'little': '<', 'big': '>'}[itype.endian] + '%d' + get_code(itype)
+                    lines.append("buf += pack('{}' % len({}), *{})".format(fmt, value, value))
+                elif isinstance(itype, Int):
+                    lines.append("buf += b''.join(item.to_bytes({}, '{}', signed={}) for item in {})".format(
+                        itype.size, itype.endian, itype.signed, value))
+                else:
+                    lines.append("buf += b''.join(item.ljust({}, {!r}).encode('{}') for item in {})".format(
+                        itype.length, itype.empty, itype.encoding, value))
+
+            lines.append("{} = len(buf)".format(end))
+            positions[name] = (at(base, pos + step['pad']), end)
+            base, pos = end, 0
+
+        crc_items = [name for name in computed if self.items[name].compute[0] == 'crc']
+        for name in [name for name in computed if name not in crc_items] + get_crc_order(self.cls, crc_items):
+            mdata = self.items[name]
+            kind, first, last = mdata.compute
+            if kind == 'size':
+                value = "{} - ({})".format(positions[first][1], positions[first][0])
+            elif kind == 'offset':
+                value = positions[first][0] + " - start"
+            elif kind == 'count':
+                value = "len(values['{}'])".format(first)
+            else:
+                value = "crc32(memoryview(buf)[{}: {}])".format(positions[first][0], positions[last][1])
+            slot = positions[name][0]
+            lines.append("value = {}".format(value))
+            lines += get_checks("value", mdata, self._where(name))
+            lines.append("buf[{}: {} + {}] = value.to_bytes({}, '{}', signed={})".format(
+                slot, slot, mdata.size, mdata.size, mdata.endian, mdata.signed))
+            if not self.frozen:
+                lines += ["if values['{}'] != value:".format(name),
+                          "    values['{}'] = value".format(name),
+                          "    _set(obj, '_image_', None)"]
+
+        # remove the positions which are not used
+        for index in reversed(range(len(lines))):
+            match = re.match(r"^(\w+) = len\(buf\)$", lines[index])
+            if match and not any(re.search(r"\b{}\b".format(match.group(1)), line) for line in lines[index + 1:]):
+                del lines[index]
+
+    def _export_element(self, elem: dict, computed: tuple) -> str:
+        if elem['kind'] == 'bits':
+            fields = []
+            for name in elem['names']:
+                mdata = self.items[name]
+                field = "(values['{}'] & {})".format(name, hex((1 << mdata.bits) - 1))
+                fields.append("{} << {}".format(field, mdata.offset) if mdata.offset else field)
+            return "({}).to_bytes({}, 'little')".format(" | ".join(fields), elem['size'])
+
+        name = elem['names'][0]
+        mdata = self.items[name]
+        value = "values['{}']".format(name)
+        if elem['kind'] == 'array':
+            return "*" + value
+        if is_native(mdata):
+            return "0" if name in computed else value
+        if isinstance(mdata, Int):
+            return "bytes({})".format(mdata.size) if name in computed else \
+                   "{}.to_bytes({}, '{}', signed={})".format(value, mdata.size, mdata.endian, mdata.signed)
+        if isinstance(mdata, String):
+            return "{}.ljust({}, {!r}).encode('{}')".format(value, mdata.length, mdata.empty, mdata.encoding)
+        return "_bytes({})".format(value)
+
+    def _gen_raw_size(self, steps: list) -> None:
+        size = self.cls._static_size()
+        if size is not None:
+            self.raw_size.append("return {}".format(size))
+            return
+
+        terms = []
+        static = 0
+        for step in steps:
+            static += step['size'] if step['kind'] == 'run' else step['pad']
+            if step['kind'] == 'run':
+                continue
+            mdata = self.items[step['name']]
+            value = "values['{}']".format(step['name'])
+            if isinstance(mdata, Struct):
+                terms.append("raw_size_{}({})".format(self._struct(mdata.struct), value))
+            elif isinstance(mdata, Bytes):
+                terms.append("len({})".format(value))
+            elif mdata.item_size is None:
+                terms.append("sum(raw_size_{}(item) for item in {})".format(self._struct(mdata.item_type), value))
+            else:
+                terms.append("len({}) * {}".format(value, mdata.item_size))
+
+        self.raw_size += ["values = obj.__dict__",
+                          "return " + " + ".join(([str(static)] if static else []) + terms)]
+
+
+########################################################################################################################
+# The module generator
+########################################################################################################################
+def generate(classes: list) -> str:
+    """ Return the source of module with codec functions of classes and the structures nested in them """
+    codecs = []
+
+    def add(cls):
+        if any(codec.cls is cls for codec in codecs):
+            return
+        if any(codec.name == cls.__name__ for codec in codecs):
+            raise ValueError("Two classes with the same name '{}'".format(cls.__name__))
+        if cls.__module__ == '__main__':
+            raise ValueError("The class '{}' must be defined in importable module".format(cls.__name__))
+        codec = ClassCodec(cls)
+        # the nested structures are generated first
+        for struct in codec.depends:
+            add(struct)
+        codecs.append(codec)
+
+    for cls in classes:
+        add(cls)
+
+    imports = {}
+    for codec in codecs:
+        imports.setdefault(codec.cls.__module__, []).append(codec.name)
+
+    with open(template_file, 'r') as file:
+        template = file.read()
+
+    return Template(template, trim_blocks=True, lstrip_blocks=True).render({
+        'imports': sorted(imports.items()),
+        'codecs': codecs
+    })
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Generate codec module for DataStructure classes")
+    parser.add_argument('module', help="The importable name of module with DataStructure classes")
+    parser.add_argument('output_file', help="The path of generated module")
+    parser.add_argument('classes', nargs='*', help="The names of classes (all classes of module by default)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    module = importlib.import_module(args.module)
+    if args.classes:
+        input_classes = [getattr(module, name) for name in args.classes]
+    else:
+        input_classes = [value for value in vars(module).values() if isinstance(value, type) and
+                         issubclass(value, DataStructure) and value.__module__ == module.__name__]
+
+    output_data = generate(input_classes)
+
+    with open(args.output_file, 'w') as f:
+        f.write(output_data)